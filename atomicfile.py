@@ -0,0 +1,34 @@
+import contextlib
+import os
+import tempfile
+
+
+# Permission bits for a file replacing `path`: the old file's, or what open()
+# would give a new one under the current umask
+def replacement_mode(path):
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+# Writes `text` to `path` through a temp file in the same folder and os.replace,
+# so readers see the old contents or the new, never a torn file. The temp file
+# is removed however the write fails, interrupts included.
+def write_atomic(path, text):
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", dir=folder)
+    replaced = False
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        # mkstemp creates the file 0600, which os.replace would keep
+        os.chmod(tmp, replacement_mode(path))
+        os.replace(tmp, path)
+        replaced = True
+    finally:
+        if not replaced:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
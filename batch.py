@@ -0,0 +1,290 @@
+import numpy as np
+
+from engine import (
+    GRID_H,
+    GRID_W,
+    INITIAL_FALL_MS,
+    KICKS_I,
+    KICKS_JLSTZ,
+    LEVEL_SPEEDUP_MS,
+    LINES_PER_LEVEL,
+    MIN_FALL_MS,
+    SHAPES,
+    SPAWN_X,
+    SPAWN_Y,
+    VISIBLE_NEXT,
+    ACTION_HARD_DROP,
+    ACTION_HOLD,
+    ACTION_LEFT,
+    ACTION_RIGHT,
+    ACTION_ROTATE_CCW,
+    ACTION_ROTATE_CW,
+    ACTION_SOFT_DROP,
+)
+
+# ----------------------- Tables -----------------------
+KINDS = list(SHAPES.keys())
+KIND_INDEX = {k: i for i, k in enumerate(KINDS)}
+ROW_DTYPE = np.uint32 if GRID_W <= 32 else np.uint64
+FULL_ROW = ROW_DTYPE((1 << GRID_W) - 1)
+LINE_SCORES = np.array([0, 100, 300, 500, 800], dtype=np.int64)
+
+# Pieces may drift past the walls while entirely above the board (same as
+# Board.collides); the batch engine clamps that drift to BATCH_X_OFF columns.
+BATCH_X_OFF = 16
+BATCH_X_SPAN = GRID_W + 2 * BATCH_X_OFF
+
+
+def build_mask_arrays():
+    # masks[k, r, x + BATCH_X_OFF, dy]: row mask; walls[...]: row sticks out of the walls
+    masks = np.zeros((len(KINDS), 4, BATCH_X_SPAN, 4), dtype=ROW_DTYPE)
+    walls = np.zeros((len(KINDS), 4, BATCH_X_SPAN, 4), dtype=bool)
+    used = np.zeros((len(KINDS), 4, 4), dtype=bool)
+    for k, kind in enumerate(KINDS):
+        for r, cells in enumerate(SHAPES[kind]):
+            for xi in range(BATCH_X_SPAN):
+                x = xi - BATCH_X_OFF
+                for cx, cy in cells:
+                    used[k, r, cy] = True
+                    if 0 <= x + cx < GRID_W:
+                        masks[k, r, xi, cy] |= ROW_DTYPE(1 << (x + cx))
+                    else:
+                        walls[k, r, xi, cy] = True
+    return masks, walls, used
+
+
+def build_kick_array():
+    # kicks[k, r_from, d, i] -> (dx, dy); d = 0 for clockwise, 1 for counterclockwise
+    kicks = np.zeros((len(KINDS), 4, 2, 5, 2), dtype=np.int16)
+    for k, kind in enumerate(KINDS):
+        table = KICKS_I if kind == "I" else KICKS_JLSTZ
+        for r in range(4):
+            for d, direction in enumerate((1, -1)):
+                offsets = table.get((r, (r + direction) % 4), [(0, 0)])
+                offsets = (offsets + [offsets[-1]] * 5)[:5]
+                kicks[k, r, d] = offsets
+    return kicks
+
+
+MASKS, WALLS, ROWS_USED = build_mask_arrays()
+KICKS = build_kick_array()
+DY = np.arange(4, dtype=np.int16)
+
+
+# ----------------------- Batch engine -----------------------
+class BatchEngine:
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.board = np.zeros((n, GRID_H), dtype=ROW_DTYPE)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.rot = np.zeros(n, dtype=np.int8)
+        self.x = np.zeros(n, dtype=np.int16)
+        self.y = np.zeros(n, dtype=np.int16)
+        self.hold = np.full(n, -1, dtype=np.int8)
+        self.hold_locked = np.zeros(n, dtype=bool)
+        self.queue = np.zeros((n, VISIBLE_NEXT), dtype=np.int8)
+        self.bag = np.zeros((n, len(KINDS)), dtype=np.int8)
+        self.bag_len = np.zeros(n, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int32)
+        self.level = np.zeros(n, dtype=np.int32)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.drop_timer = np.zeros(n, dtype=np.int32)
+        self.fall_ms = np.full(n, INITIAL_FALL_MS, dtype=np.int32)
+        self.last_clear_rows = np.zeros(n, dtype=np.int8)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self, idx=None):
+        if idx is None:
+            idx = np.arange(self.n)
+        idx = np.asarray(idx)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        self.board[idx] = 0
+        self.hold[idx] = -1
+        self.hold_locked[idx] = False
+        self.bag_len[idx] = 0
+        self.score[idx] = 0
+        self.lines[idx] = 0
+        self.level[idx] = 0
+        self.pieces[idx] = 0
+        self.drop_timer[idx] = 0
+        self.fall_ms[idx] = INITIAL_FALL_MS
+        self.last_clear_rows[idx] = 0
+        self.game_over[idx] = False
+        for i in range(VISIBLE_NEXT):
+            self.queue[idx, i] = self._draw(idx)
+        self._spawn(idx)
+
+    # ---------------- Bag / spawn ----------------
+    def _draw(self, idx):
+        empty = idx[self.bag_len[idx] == 0]
+        if len(empty):
+            base = np.tile(np.arange(len(KINDS), dtype=np.int8), (len(empty), 1))
+            self.bag[empty] = self.rng.permuted(base, axis=1)
+            self.bag_len[empty] = len(KINDS)
+        self.bag_len[idx] -= 1
+        return self.bag[idx, self.bag_len[idx]]
+
+    def _spawn(self, idx):
+        self.kind[idx] = self.queue[idx, 0]
+        self.queue[idx, :-1] = self.queue[idx, 1:]
+        self.queue[idx, -1] = self._draw(idx)
+        self._place_at_spawn(idx)
+
+    def _place_at_spawn(self, idx):
+        self.rot[idx] = 0
+        self.x[idx] = SPAWN_X
+        self.y[idx] = SPAWN_Y
+        hit = self._collides(idx, self.kind[idx], self.rot[idx], self.x[idx], self.y[idx])
+        self.game_over[idx[hit]] = True
+
+    # ---------------- Collision ----------------
+    def _collides(self, idx, kind, rot, x, y):
+        xi = np.clip(x.astype(np.intp) + BATCH_X_OFF, 0, BATCH_X_SPAN - 1)
+        kind = kind.astype(np.intp)
+        rot = rot.astype(np.intp)
+        masks = MASKS[kind, rot, xi]
+        walls = WALLS[kind, rot, xi]
+        used = ROWS_USED[kind, rot]
+        gy = y[:, None] + DY
+        on_board = gy >= 0
+        rows = self.board[idx[:, None], np.clip(gy, 0, GRID_H - 1)]
+        hit = ((gy >= GRID_H) & used) | walls | ((rows & masks) != 0)
+        return (hit & on_board).any(axis=1)
+
+    def _try(self, idx, rot, x, y):
+        ok = ~self._collides(idx, self.kind[idx], rot, x, y)
+        moved = idx[ok]
+        self.rot[moved] = rot[ok]
+        self.x[moved] = x[ok]
+        self.y[moved] = y[ok]
+        return ok
+
+    def _drop_distance(self, idx):
+        d = np.zeros(len(idx), dtype=np.int16)
+        active = np.ones(len(idx), dtype=bool)
+        kind, rot, x, y = self.kind[idx], self.rot[idx], self.x[idx], self.y[idx]
+        while active.any():
+            a = np.flatnonzero(active)
+            hit = self._collides(idx[a], kind[a], rot[a], x[a], y[a] + d[a] + 1)
+            active[a[hit]] = False
+            d[a[~hit]] += 1
+        return d
+
+    # ---------------- Actions ----------------
+    def _move(self, idx, dx, dy):
+        x = np.clip(self.x[idx] + dx, -BATCH_X_OFF, GRID_W + BATCH_X_OFF - 1)
+        self._try(idx, self.rot[idx], x.astype(np.int16), self.y[idx] + dy)
+
+    def _rotate(self, idx, d):
+        kind = self.kind[idx].astype(np.intp)
+        r_from = self.rot[idx].astype(np.intp)
+        r_to = ((r_from + (1 if d == 0 else -1)) % 4).astype(np.int8)
+        offsets = KICKS[kind, r_from, d]
+        pending = np.arange(len(idx))
+        for i in range(5):
+            if not len(pending):
+                break
+            sub = idx[pending]
+            x = np.clip(
+                self.x[sub] + offsets[pending, i, 0],
+                -BATCH_X_OFF,
+                GRID_W + BATCH_X_OFF - 1,
+            ).astype(np.int16)
+            ok = self._try(sub, r_to[pending], x, self.y[sub] + offsets[pending, i, 1])
+            pending = pending[~ok]
+
+    def _hard_drop(self, idx):
+        self.y[idx] += self._drop_distance(idx)
+        self._lock(idx)
+
+    def _hold(self, idx):
+        idx = idx[~self.hold_locked[idx]]
+        fresh = idx[self.hold[idx] < 0]
+        swap = idx[self.hold[idx] >= 0]
+        if len(fresh):
+            self.hold[fresh] = self.kind[fresh]
+            self._spawn(fresh)
+        if len(swap):
+            held = self.hold[swap].copy()
+            self.hold[swap] = self.kind[swap]
+            self.kind[swap] = held
+            self._place_at_spawn(swap)
+        self.hold_locked[idx] = True
+
+    def _lock(self, idx):
+        kind = self.kind[idx].astype(np.intp)
+        rot = self.rot[idx].astype(np.intp)
+        xi = np.clip(self.x[idx].astype(np.intp) + BATCH_X_OFF, 0, BATCH_X_SPAN - 1)
+        masks = MASKS[kind, rot, xi]
+        gy = self.y[idx][:, None] + DY
+        above = ((gy < 0) & ROWS_USED[kind, rot]).any(axis=1)
+        self.game_over[idx[above]] = True
+        for dy in range(4):
+            rows = gy[:, dy]
+            ok = (rows >= 0) & (rows < GRID_H) & ~above
+            self.board[idx[ok], rows[ok]] |= masks[ok, dy]
+        live = idx[~above]
+        self.pieces[idx] += 1
+        self._clear_lines(live)
+        self.fall_ms[idx] = np.maximum(
+            MIN_FALL_MS, INITIAL_FALL_MS - self.level[idx] * LEVEL_SPEEDUP_MS
+        )
+        self.hold_locked[idx] = False
+        self._spawn(live)
+
+    def _clear_lines(self, idx):
+        self.last_clear_rows[idx] = 0
+        full = self.board[idx] == FULL_ROW
+        counts = full.sum(axis=1)
+        has = counts > 0
+        if not has.any():
+            return
+        idx, full, counts = idx[has], full[has], counts[has]
+        order = np.argsort(~full, axis=1, kind="stable")
+        rows = np.take_along_axis(self.board[idx], order, axis=1)
+        rows[np.arange(GRID_H) < counts[:, None]] = 0
+        self.board[idx] = rows
+        self.last_clear_rows[idx] = counts
+        self.score[idx] += LINE_SCORES[counts] * (self.level[idx] + 1)
+        self.lines[idx] += counts
+        self.level[idx] = np.maximum(self.level[idx], self.lines[idx] // LINES_PER_LEVEL)
+
+    # ---------------- Public API ----------------
+    def step(self, actions):
+        actions = np.asarray(actions)
+        score = self.score.copy()
+        live = ~self.game_over
+        for action, fn in (
+            (ACTION_LEFT, lambda i: self._move(i, -1, 0)),
+            (ACTION_RIGHT, lambda i: self._move(i, 1, 0)),
+            (ACTION_SOFT_DROP, lambda i: self._move(i, 0, 1)),
+            (ACTION_ROTATE_CW, lambda i: self._rotate(i, 0)),
+            (ACTION_ROTATE_CCW, lambda i: self._rotate(i, 1)),
+            (ACTION_HARD_DROP, self._hard_drop),
+            (ACTION_HOLD, self._hold),
+        ):
+            idx = np.flatnonzero(live & (actions == action))
+            if len(idx):
+                fn(idx)
+        return self.score - score, self.game_over.copy()
+
+    def tick(self, dt_ms):
+        score = self.score.copy()
+        live = np.flatnonzero(~self.game_over)
+        self.drop_timer[live] += dt_ms
+        while len(live):
+            live = live[self.drop_timer[live] >= self.fall_ms[live]]
+            if not len(live):
+                break
+            self.drop_timer[live] -= self.fall_ms[live]
+            y = self.y[live] + 1
+            hit = self._collides(live, self.kind[live], self.rot[live], self.x[live], y)
+            self.y[live[~hit]] = y[~hit]
+            if hit.any():
+                self._lock(live[hit])
+            live = live[~hit]
+        return self.score - score, self.game_over.copy()
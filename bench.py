@@ -0,0 +1,481 @@
+import os
+
+# The render benchmarks draw offscreen; set before pygame is first imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import cProfile
+import json
+import platform
+import pstats
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from itertools import cycle, islice
+
+from engine import (
+    ACTION_HARD_DROP,
+    ACTION_LEFT,
+    ACTION_RIGHT,
+    ACTION_ROTATE_CCW,
+    ACTION_ROTATE_CW,
+    ACTION_SOFT_DROP,
+    COLORS,
+    GRID_H,
+    GRID_W,
+    SHAPES,
+    BitBoard,
+    Engine,
+    Piece,
+    zobrist,
+)
+
+# ----------------------- Settings -----------------------
+# Results are kept beside this file (and git-ignored), wherever it is run from
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_FILE = os.path.join(HERE, "bench_results.json")
+BASELINE_FILE = os.path.join(HERE, "bench_baseline.json")
+REGRESSION_THRESHOLD = 0.15  # slower than baseline by more than this fails
+REPEAT = 5  # timed runs per benchmark; the median and best are reported
+TARGET_MS = 200  # each timed run is sized to take about this long
+RENDER_SIZE = (1920, 1080)
+DENSE_ROWS = 14  # filled rows at the bottom of benchmark boards
+DENSE_FILL = 0.7
+FILL_COLOR = COLORS["T"]  # a piece's colour, so the filled cells get its code
+
+
+# ----------------------- Fixtures -----------------------
+# Boards are filled through rows and grid, then the hash, surface index and
+# cells are rebuilt from them, as Engine.restore does
+def rebuild_board(b):
+    b.hash = zobrist(b.rows)
+    b.rebuild_surface()
+    b.rebuild_cells()
+
+
+# A board whose bottom `rows` rows are filled at `fill`, none of them full
+def dense_board(rng, rows=DENSE_ROWS, fill=DENSE_FILL):
+    b = BitBoard()
+    for y in range(GRID_H - rows, GRID_H):
+        gap = rng.randrange(GRID_W)
+        for x in range(GRID_W):
+            if x != gap and rng.random() < fill:
+                b.rows[y] |= 1 << x
+                b.grid[y][x] = FILL_COLOR
+    rebuild_board(b)
+    return b
+
+
+def copy_board(src):
+    b = BitBoard()
+    b.rows = list(src.rows)
+    b.grid = [list(row) for row in src.grid]
+    b.hash = src.hash
+    b.heights = list(src.heights)
+    b.holes = list(src.holes)
+    b.cells[:] = src.cells
+    return b
+
+
+# Moves the current piece to a random rotation and column, if it fits there
+def aim(engine, rng):
+    p = engine.current
+    rot, x = rng.randrange(4), rng.randrange(-2, GRID_W)
+    if not engine.board.collides_at(p.kind, rot, x, p.y):
+        p.rot, p.x = rot, x
+
+
+# ----------------------- Benchmarks -----------------------
+# Each takes an op count, does its setup untimed and returns the seconds the
+# ops took
+def bench_collides(n):
+    rng = random.Random(1)
+    board = dense_board(rng)
+    pieces = []
+    for _ in range(1024):
+        kind = rng.choice(list(SHAPES))
+        p = Piece(kind, rng.randrange(-2, GRID_W), rng.randrange(-2, GRID_H))
+        p.rot = rng.randrange(4)
+        pieces.append(p)
+    collides = board.collides
+    start = time.perf_counter()
+    for p in islice(cycle(pieces), n):
+        collides(p)
+    return time.perf_counter() - start
+
+
+# Vertical I pieces dropped into a well beside 1-4 full-but-one rows, so every
+# lock clears lines on an otherwise dense board
+def bench_lock_clear(n):
+    rng = random.Random(2)
+    templates = []
+    for depth in range(1, 5):
+        for _ in range(8):
+            b = dense_board(rng)
+            well = rng.randrange(GRID_W)
+            for y in range(GRID_H - depth, GRID_H):
+                b.rows[y] = ((1 << GRID_W) - 1) & ~(1 << well)
+                for x in range(GRID_W):
+                    b.grid[y][x] = None if x == well else FILL_COLOR
+            for y in range(GRID_H - DENSE_ROWS, GRID_H - depth):
+                b.rows[y] &= ~(1 << well)
+                b.grid[y][well] = None
+            rebuild_board(b)
+            p = Piece("I", well - 2, GRID_H - 4)
+            p.rot = 1
+            templates.append((b, p))
+    # Fresh copies are made untimed, a chunk at a time
+    elapsed = 0.0
+    source = cycle(templates)
+    while n > 0:
+        work = [(copy_board(b), p) for b, p in islice(source, min(n, 1024))]
+        n -= len(work)
+        start = time.perf_counter()
+        for b, p in work:
+            b.lock_piece(p)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+# Rotations whose unkicked position collides, so SRS walks the kick table
+def bench_rotate(n):
+    rng = random.Random(3)
+    engine = Engine(3)
+    engine.board = dense_board(rng, rows=16, fill=0.55)
+    board = engine.board
+    states = []
+    while len(states) < 1024:
+        kind = rng.choice(list(SHAPES))
+        rot, direction = rng.randrange(4), rng.choice((1, -1))
+        x, y = rng.randrange(-2, GRID_W), rng.randrange(GRID_H - 16, GRID_H - 1)
+        if board.collides_at(kind, rot, x, y):
+            continue
+        if board.collides_at(kind, (rot + direction) % 4, x, y):
+            states.append((kind, rot, x, y, direction))
+    p = engine.current
+    rotate = engine.rotate
+    start = time.perf_counter()
+    for kind, rot, x, y, direction in islice(cycle(states), n):
+        p.kind, p.rot, p.x, p.y = kind, rot, x, y
+        rotate(direction)
+    return time.perf_counter() - start
+
+
+# Engine.hard_drop from a random rotation and column: drop distance, lock,
+# line clears and the next spawn; a game that ends is restarted
+def bench_hard_drop(n):
+    rng = random.Random(4)
+    engine = Engine(4)
+    start = time.perf_counter()
+    for _ in range(n):
+        if engine.board.game_over:
+            engine.reset(rng.getrandbits(32))
+        aim(engine, rng)
+        engine.hard_drop()
+    return time.perf_counter() - start
+
+
+GAME_ACTIONS = (
+    ACTION_LEFT,
+    ACTION_RIGHT,
+    ACTION_ROTATE_CW,
+    ACTION_ROTATE_CCW,
+    ACTION_SOFT_DROP,
+)
+
+
+# Whole games through step() and tick() with random inputs; one op is a piece
+def bench_game(n):
+    rng = random.Random(5)
+    engine = Engine(5)
+    start = time.perf_counter()
+    for _ in range(n):
+        if engine.board.game_over:
+            engine.reset(rng.getrandbits(32))
+        for _ in range(rng.randrange(6)):
+            engine.step(rng.choice(GAME_ACTIONS))
+            engine.tick(16)
+        engine.step(ACTION_HARD_DROP)
+    return time.perf_counter() - start
+
+
+def bench_bot_game(n):
+    from bot import Bot
+
+    engine = Engine(6)
+    bot = Bot()
+    start = time.perf_counter()
+    for _ in range(n):
+        if engine.board.game_over:
+            engine.reset(engine.seed + 1)
+        bot.play_piece(engine)
+    return time.perf_counter() - start
+
+
+# The bot's inputs fed through step() one at a time, each followed by a tick,
+# as the game plays at bot speed 1; planning is untimed. One op is an input.
+def bench_bot_inputs(n):
+    from bot import Bot
+
+    engine = Engine(9)
+    bot = Bot()
+    elapsed = 0.0
+    while n > 0:
+        if engine.board.game_over:
+            engine.reset(engine.seed + 1)
+        actions = (bot.plan(engine) or [ACTION_HARD_DROP])[:n]
+        n -= len(actions)
+        start = time.perf_counter()
+        for action in actions:
+            engine.step(action)
+            engine.tick(16)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+_game = None
+
+
+# One Game drawing into an offscreen RENDER_SIZE surface, with some pieces
+# already on the board
+def render_game():
+    global _game
+    if _game is None:
+        from tetris import Game
+
+        scores = os.path.join(tempfile.mkdtemp(prefix="tetris-bench-"), "s.json")
+        _game = Game(scores_path=scores, offscreen=RENDER_SIZE)
+    _game.reset(7)
+    rng = random.Random(7)
+    for _ in range(12):
+        if _game.board.game_over:
+            break
+        aim(_game, rng)
+        _game.hard_drop()
+    _game.render()
+    return _game
+
+
+# Every layer and the background redrawn, as after a layout change
+def bench_render_full(n):
+    game = render_game()
+    start = time.perf_counter()
+    for _ in range(n):
+        game.background = None
+        game.render()
+    return time.perf_counter() - start
+
+
+# A frame of play: one input and a tick, then a dirty-rect render
+def bench_render_frame(n):
+    game = render_game()
+    rng = random.Random(8)
+    start = time.perf_counter()
+    for _ in range(n):
+        if game.board.game_over:
+            game.reset(rng.getrandbits(32))
+        game.step(rng.choice(GAME_ACTIONS + (ACTION_HARD_DROP,)))
+        game.tick(16)
+        game.render()
+    return time.perf_counter() - start
+
+
+# name -> (function, unit, module it needs beyond the engine)
+BENCHMARKS = {
+    "collides": (bench_collides, "call", None),
+    "lock_clear": (bench_lock_clear, "lock", None),
+    "rotate": (bench_rotate, "rotation", None),
+    "hard_drop": (bench_hard_drop, "drop", None),
+    "game": (bench_game, "piece", None),
+    "bot_game": (bench_bot_game, "piece", "numpy"),
+    "bot_inputs": (bench_bot_inputs, "input", "numpy"),
+    "render_full": (bench_render_full, "frame", "pygame"),
+    "render_frame": (bench_render_frame, "frame", "pygame"),
+}
+
+
+# ----------------------- Harness -----------------------
+# Grows the op count until a run takes a measurable time, sizes each run to
+# target_ms, and reports the median and best of `repeat` runs per op
+def measure(fn, repeat=REPEAT, target_ms=TARGET_MS):
+    n = 1
+    while True:
+        elapsed = fn(n)
+        if elapsed >= target_ms / 1000 / 10 or n >= 1 << 22:
+            break
+        n *= 10
+    n = max(1, round(n * target_ms / 1000 / max(elapsed, 1e-9)))
+    per_op = sorted(fn(n) / n for _ in range(repeat))
+    median = statistics.median(per_op)
+    return {
+        "ops": n,
+        "repeat": repeat,
+        "median_us": round(median * 1e6, 3),
+        "best_us": round(per_op[0] * 1e6, 3),
+        "per_sec": round(1 / median, 1),
+    }
+
+
+# Pieces built per op (Piece.__init__ calls, counted under cProfile over an
+# extra untimed run of PIECE_COUNT_OPS ops) for the benchmarks that move
+# pieces. A run of 0 ops does only the benchmark's setup, whose pieces are
+# subtracted, so the figure is the same whatever the timed runs' length.
+PIECE_COUNTED = ("hard_drop", "game", "bot_inputs", "render_frame")
+PIECE_COUNT_OPS = 500
+
+
+def piece_calls(fn, n):
+    code = Piece.__init__.__code__
+    key = (code.co_filename, code.co_firstlineno, code.co_name)
+    prof = cProfile.Profile()
+    prof.enable()
+    fn(n)
+    prof.disable()
+    return pstats.Stats(prof).stats.get(key, (0, 0))[1]
+
+
+def piece_allocs(fn, n):
+    return round((piece_calls(fn, n) - piece_calls(fn, 0)) / n, 3)
+
+
+def available(module):
+    if module is None:
+        return True
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def environment():
+    env = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "sdl_video_driver": os.environ.get("SDL_VIDEODRIVER"),
+    }
+    for module in ("numpy", "pygame"):
+        if available(module):
+            env[module] = sys.modules[module].__version__
+    try:
+        env["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return env
+
+
+def run(names, repeat=REPEAT, target_ms=TARGET_MS):
+    results = {}
+    for name in names:
+        fn, unit, needs = BENCHMARKS[name]
+        if not available(needs):
+            results[name] = {"skipped": f"needs {needs}"}
+            continue
+        results[name] = {"unit": unit, **measure(fn, repeat, target_ms)}
+        if name in PIECE_COUNTED:
+            results[name]["pieces_per_op"] = piece_allocs(fn, PIECE_COUNT_OPS)
+    return {"environment": environment(), "results": results}
+
+
+# Per benchmark: (name, baseline us, current us, ratio, status); "regressed"
+# means slower than the baseline by more than `threshold`. Best runs are
+# compared: scheduler and cache noise only ever adds time, so the fastest of
+# `repeat` runs moves far less between identical builds than the median does
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    rows = []
+    old = baseline.get("results", {})
+    for name, new in report["results"].items():
+        if "best_us" not in new or "best_us" not in old.get(name, {}):
+            continue
+        before, after = old[name]["best_us"], new["best_us"]
+        ratio = after / before if before else 1.0
+        if ratio > 1 + threshold:
+            status = "regressed"
+        elif ratio < 1 / (1 + threshold):
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, before, after, round(ratio, 3), status))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the engine and renderer hot paths"
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument(
+        "--target-ms", type=float, default=TARGET_MS, help="length of each timed run"
+    )
+    parser.add_argument("--out", default=BENCH_FILE, help="write results here")
+    parser.add_argument(
+        "--baseline", default=BASELINE_FILE, help="compare against these results"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="allowed slowdown as a fraction (0.15 = 15%%)",
+    )
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    report = run(args.names or list(BENCHMARKS), args.repeat, args.target_ms)
+    for name, r in report["results"].items():
+        if "skipped" in r:
+            print(f"{name:<14}skipped ({r['skipped']})")
+        else:
+            pieces = r.get("pieces_per_op")
+            print(
+                f"{name:<14}{r['median_us']:>12.3f} us/{r['unit']:<9}"
+                f"{r['per_sec']:>14.1f} {r['unit']}s/s"
+                + ("" if pieces is None else f"{pieces:>10.3f} Pieces/{r['unit']}")
+            )
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        sys.exit()
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; --save-baseline to create one")
+        sys.exit()
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(report, baseline, args.threshold)
+    print(f"\nbest run vs {args.baseline} (threshold {args.threshold:.0%})")
+    for name, before, after, ratio, status in rows:
+        print(f"{name:<14}{before:>12.3f}{after:>12.3f} us {ratio:>7.3f}x  {status}")
+    regressed = [row[0] for row in rows if row[4] == "regressed"]
+    if regressed:
+        print(f"regressed: {', '.join(regressed)}")
+    sys.exit(1 if regressed else 0)
@@ -0,0 +1,206 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from engine import GRID_H, GRID_W, ZOBRIST_SALTS, Engine, ACTION_HARD_DROP, ACTION_HOLD
+from placements import board_rows, placements_for_rows
+
+# ----------------------- Settings -----------------------
+DEFAULT_WEIGHTS = {
+    "aggregate_height": -0.51,
+    "holes": -3.5,
+    "bumpiness": -0.18,
+    "row_transitions": -0.32,
+    "col_transitions": -0.93,
+    "wells": -0.34,
+    "lines": 0.76,
+}
+FEATURES = list(DEFAULT_WEIGHTS.keys())
+
+COLUMN_BITS = np.arange(GRID_W, dtype=np.uint32)
+FULL = np.uint32((1 << GRID_W) - 1)
+LEFT_WALL = np.uint32(1)
+RIGHT_WALL = np.uint32(1 << (GRID_W - 1))
+
+# Taller boards extend ZOBRIST_SALTS; the bot's boards are always GRID_H rows
+SALTS = np.array(ZOBRIST_SALTS[:GRID_H], dtype=np.uint64)
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    _POP16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+    def popcount(a):
+        return _POP16[a & 0xFFFF] + _POP16[a >> 16]
+
+
+def load_weights(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    unknown = set(data) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"unknown weight(s): {', '.join(sorted(unknown))}")
+    return {**DEFAULT_WEIGHTS, **data}
+
+
+# engine.zobrist for an (m, h) array of boards, salts holding h row salts;
+# uint64 arithmetic wraps. GRID_W rows fit in one word, so this is row_key's
+# single-round case.
+def hash_boards(rows, salts=SALTS):
+    z = rows.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + salts
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return np.bitwise_xor.reduce(z ^ (z >> np.uint64(31)), axis=1)
+
+
+# ----------------------- Features -----------------------
+# rows: (m, GRID_H) uint32 row masks, one board per candidate. Everything but
+# per-column heights is computed on the masks directly.
+def board_features(rows, lines):
+    covered = np.bitwise_or.accumulate(rows, axis=1)
+    col_heights = ((covered[:, :, None] >> COLUMN_BITS) & 1).sum(axis=1, dtype=np.int32)
+
+    holes = popcount(covered & ~rows).sum(axis=1, dtype=np.int64)
+    bumpiness = np.abs(np.diff(col_heights, axis=1)).sum(axis=1)
+
+    # Walls and floor count as filled
+    left_filled = (rows << 1) & FULL | LEFT_WALL
+    right_filled = (rows >> 1) | RIGHT_WALL
+    row_transitions = popcount(rows ^ left_filled).sum(axis=1, dtype=np.int64)
+    row_transitions += popcount(~rows & RIGHT_WALL).sum(axis=1, dtype=np.int64)
+    below = np.concatenate([rows[:, 1:], np.full((rows.shape[0], 1), FULL, dtype=np.uint32)], axis=1)
+    col_transitions = popcount(rows ^ below).sum(axis=1, dtype=np.int64)
+
+    # Well cells: open from above with both neighbours filled. A well of depth d
+    # adds 1 + 2 + ... + d, counted as the popcount of successively deeper ANDs.
+    well = ~covered & left_filled & right_filled & FULL
+    wells = np.zeros(rows.shape[0], dtype=np.int64)
+    run = well
+    while run.shape[1] and run.any():
+        wells += popcount(run).sum(axis=1, dtype=np.int64)
+        run = run[:, 1:] & well[:, : run.shape[1] - 1]
+
+    return {
+        "aggregate_height": col_heights.sum(axis=1),
+        "holes": holes,
+        "bumpiness": bumpiness,
+        "row_transitions": row_transitions,
+        "col_transitions": col_transitions,
+        "wells": wells,
+        "lines": np.asarray(lines),
+    }
+
+
+def score_boards(rows, lines, weights):
+    feats = board_features(rows, lines)
+    total = np.zeros(rows.shape[0], dtype=np.float64)
+    for name, w in weights.items():
+        if w:
+            total += w * feats[name]
+    return total
+
+
+# ----------------------- Bot -----------------------
+class Bot:
+    def __init__(self, weights=None, use_hold=True):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.use_hold = use_hold
+
+    def candidates(self, engine):
+        rows = board_rows(engine.board)
+        options = [((), engine.current.kind)]
+        if self.use_hold and not engine.hold_locked:
+            alt = engine.hold if engine.hold is not None else engine.queue[0]
+            if alt != engine.current.kind:
+                options.append(((ACTION_HOLD,), alt))
+        out = []
+        for prefix, kind in options:
+            for p in placements_for_rows(rows, kind):
+                out.append((prefix + p.path, p))
+        return rows, out
+
+    # Returns the action list for the best placement of the current piece
+    def plan(self, engine):
+        rows, cands = self.candidates(engine)
+        if not cands:
+            return []
+        boards, lines = self.lock_candidates(rows, [p for _, p in cands])
+        best = int(np.argmax(score_boards(boards, lines, self.weights)))
+        return list(cands[best][0])
+
+    # Locks every placement into a copy of rows (one board, or one per placement)
+    # and clears full lines, all at once
+    @staticmethod
+    def lock_candidates(rows, placements):
+        n = len(placements)
+        boards = np.array(rows, dtype=np.uint32)
+        if boards.ndim == 1:
+            boards = np.repeat(boards[None, :], n, axis=0)
+        gi, gy, gm = [], [], []
+        for i, p in enumerate(placements):
+            for y, m in p.rows:
+                gi.append(i)
+                gy.append(y)
+                gm.append(m)
+        boards[gi, gy] |= np.array(gm, dtype=np.uint32)
+        full = boards == FULL
+        lines = full.sum(axis=1)
+        cleared = np.flatnonzero(lines)
+        if len(cleared):
+            order = np.argsort(~full[cleared], axis=1, kind="stable")
+            kept = np.take_along_axis(boards[cleared], order, axis=1)
+            kept[np.arange(GRID_H) < lines[cleared, None]] = 0
+            boards[cleared] = kept
+        return boards, lines
+
+    # Plays actions, then hard drops if they did not lock the piece (no
+    # placement was found, or the plan only held) so every call places one
+    @staticmethod
+    def play_plan(engine, actions):
+        pieces = engine.pieces
+        for a in actions:
+            engine.step(a)
+        if engine.pieces == pieces and not engine.board.game_over:
+            engine.step(ACTION_HARD_DROP)
+            actions = list(actions) + [ACTION_HARD_DROP]
+        return actions
+
+    def play_piece(self, engine):
+        return self.play_plan(engine, self.plan(engine))
+
+
+def run_headless(pieces, seed=None, weights=None):
+    engine = Engine(seed)
+    bot = Bot(weights)
+    start = time.perf_counter()
+    games = 1
+    placed = 0
+    for _ in range(pieces):
+        if engine.board.game_over:
+            placed += engine.pieces
+            engine.reset(None if seed is None else seed + games)
+            games += 1
+        bot.play_piece(engine)
+    elapsed = time.perf_counter() - start
+    placed += engine.pieces
+    return {
+        "pieces": placed,
+        "games": games,
+        "seconds": round(elapsed, 3),
+        "pieces_per_sec": round(placed / elapsed, 1),
+        "score": engine.board.score,
+        "lines": engine.board.lines,
+        "level": engine.board.level,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the heuristic bot headless")
+    parser.add_argument("--pieces", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--weights", help="JSON file of feature weights")
+    args = parser.parse_args()
+    w = load_weights(args.weights) if args.weights else None
+    print(json.dumps(run_headless(args.pieces, args.seed, w), indent=2))
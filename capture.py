@@ -0,0 +1,225 @@
+import os
+
+# Frames are drawn offscreen; set before pygame is first imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+import pygame
+
+from replay import Replay
+from tetris import FPS, Game
+
+# ----------------------- Settings -----------------------
+CAPTURE_SIZE = (960, 540)
+CAPTURE_FRAMES = 600
+RING_FRAMES = 120  # frames kept when not writing to a file
+FRAME_MS = 1000 / FPS  # game time per captured frame
+
+
+# ----------------------- Views -----------------------
+# (height, width) uint8 view of board.cells, 0 for empty and CELL_CODES[kind]
+# for filled cells. No copy is made: the view follows the board as pieces lock
+# and lines clear. reset() and restore() replace the board, so take a new view
+# after either. Read-only, since writes would bypass grid and rows.
+def board_view(board):
+    view = np.frombuffer(board.cells, dtype=np.uint8).reshape(board.height, board.width)
+    view.flags.writeable = False
+    return view
+
+
+# (height, width, 3) RGB view of a surface's pixels through surfarray. The
+# surface stays locked, and cannot be blitted to, while the view is alive.
+def frame_view(surface):
+    return pygame.surfarray.pixels3d(surface).transpose(1, 0, 2)
+
+
+# The one copy a captured frame costs: surface pixels into `out`
+def copy_frame(surface, out):
+    np.copyto(out, frame_view(surface))
+
+
+# ----------------------- Sinks -----------------------
+# Both preallocate every frame up front and take push(surface) per frame;
+# count is the number of frames pushed so far.
+class FrameRing:
+    def __init__(self, capacity, size):
+        w, h = size
+        self.frames = np.zeros((capacity, h, w, 3), dtype=np.uint8)
+        self.count = 0
+
+    def push(self, surface):
+        copy_frame(surface, self.frames[self.count % len(self.frames)])
+        self.count += 1
+
+    # The frames held, oldest first (a copy only once the ring has wrapped)
+    def ordered(self):
+        n = len(self.frames)
+        if self.count <= n:
+            return self.frames[: self.count]
+        i = self.count % n
+        return np.concatenate((self.frames[i:], self.frames[:i]))
+
+    def close(self):
+        pass
+
+
+# A memory-mapped .npy of shape (frames, h, w, 3), readable with
+# np.load(path, mmap_mode="r"). Frames past `count` stay black.
+class FrameFile:
+    def __init__(self, path, frames, size):
+        w, h = size
+        self.path = path
+        self.frames = np.lib.format.open_memmap(
+            path, mode="w+", dtype=np.uint8, shape=(frames, h, w, 3)
+        )
+        self.count = 0
+
+    def push(self, surface):
+        copy_frame(surface, self.frames[self.count])
+        self.count += 1
+
+    def close(self):
+        self.frames.flush()
+
+
+# ----------------------- Drivers -----------------------
+# advance(dt) moves the game on by dt ms of game time
+class BotDriver:
+    def __init__(self, game, seed=0):
+        self.game = game
+        self.seed = seed
+        self.games = 0
+        self.acc = 0.0
+        game.reset(seed)
+
+    def advance(self, dt):
+        game = self.game
+        if game.board.game_over:
+            self.games += 1
+            game.reset(self.seed + self.games)
+        game.update_bot()
+        self.acc = game.simulate(self.acc + dt)
+
+
+# Plays a recording back tick by tick, as replay.simulate does; once it ends
+# the last frame repeats
+class ReplayDriver:
+    def __init__(self, game, recording):
+        self.game = game
+        self.recording = recording
+        self.tick = 0
+        self.action_i = 0
+        self.acc = 0.0
+        game.randomizer = recording.randomizer
+        game.reset(recording.seed)
+        self.apply_actions()
+
+    def apply_actions(self):
+        actions = self.recording.actions
+        while self.action_i < len(actions) and actions[self.action_i][0] == self.tick:
+            self.game.step(actions[self.action_i][1])
+            self.action_i += 1
+
+    def advance(self, dt):
+        dts = self.recording.dts
+        self.acc += dt
+        while self.tick < len(dts) and self.acc >= dts[self.tick]:
+            self.acc -= dts[self.tick]
+            self.game.tick(dts[self.tick])
+            self.tick += 1
+            self.apply_actions()
+
+
+# Renders `frames` frames of frame_ms game time each, as fast as they draw,
+# pushing every one to sink
+def capture(game, driver, sink, frames, frame_ms=FRAME_MS):
+    start = time.perf_counter()
+    for _ in range(frames):
+        driver.advance(frame_ms)
+        game.update_floaters(frame_ms)
+        game.render()
+        sink.push(game.screen)
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": frames,
+        "size": list(game.screen.get_size()),
+        "seconds": round(elapsed, 3),
+        "frames_per_sec": round(frames / elapsed, 1),
+        "game_seconds": round(frames * frame_ms / 1000, 2),
+        "pieces": game.pieces,
+        "score": game.board.score,
+    }
+
+
+def parse_size(text):
+    try:
+        w, h = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH, got {text!r}")
+    return w, h
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render games headless and capture the frames as arrays"
+    )
+    parser.add_argument("--frames", type=int, default=CAPTURE_FRAMES)
+    parser.add_argument(
+        "--size",
+        type=parse_size,
+        default=CAPTURE_SIZE,
+        help=f"frame size as WxH (default {CAPTURE_SIZE[0]}x{CAPTURE_SIZE[1]})",
+    )
+    parser.add_argument(
+        "--frame-ms", type=float, default=FRAME_MS, help="game time per frame"
+    )
+    parser.add_argument(
+        "--out", metavar="PATH", help="write frames to this memory-mapped .npy"
+    )
+    parser.add_argument(
+        "--ring",
+        type=int,
+        default=RING_FRAMES,
+        help="without --out, keep only the last RING frames in memory",
+    )
+    parser.add_argument("--replay", metavar="FILE", help="play back this replay")
+    parser.add_argument("--seed", type=int, default=0, help="bot games' first seed")
+    parser.add_argument(
+        "--bot-speed",
+        type=int,
+        default=1,
+        help="bot actions per frame (0 = place a whole piece every frame)",
+    )
+    args = parser.parse_args()
+    scores = os.path.join(tempfile.mkdtemp(prefix="tetris-capture-"), "s.json")
+    if args.replay:
+        rec = Replay.load(args.replay).recording
+        game = Game(
+            scores_path=scores, width=rec.width, height=rec.height, offscreen=args.size
+        )
+        driver = ReplayDriver(game, rec)
+    else:
+        from bot import Bot
+
+        game = Game(Bot(), args.bot_speed, scores_path=scores, offscreen=args.size)
+        driver = BotDriver(game, args.seed)
+    if args.out:
+        sink = FrameFile(args.out, args.frames, args.size)
+    else:
+        sink = FrameRing(args.ring, args.size)
+    try:
+        result = capture(game, driver, sink, args.frames, args.frame_ms)
+    finally:
+        sink.close()
+        game.scores.close()
+        pygame.quit()
+    if args.out:
+        result["out"] = args.out
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,943 @@
+import math
+import random
+from collections import deque, namedtuple
+from itertools import islice
+
+# ----------------------- Rules -----------------------
+GRID_W, GRID_H = 10, 20
+MIN_BOARD_SIZE = 4  # boards may be any size from 4x4 up
+VISIBLE_NEXT = 3
+LINES_PER_LEVEL = 10
+INITIAL_FALL_MS = 800
+LEVEL_SPEEDUP_MS = 60
+MIN_FALL_MS = 70
+SPAWN_X, SPAWN_Y = 3, -2
+
+# Colors
+COLORS = {
+    "I": (0, 240, 240),
+    "J": (0, 0, 240),
+    "L": (240, 160, 0),
+    "O": (240, 240, 0),
+    "S": (0, 240, 0),
+    "T": (160, 0, 240),
+    "Z": (240, 0, 0),
+    "ghost": (150, 150, 155),
+    "bg": (12, 14, 20),
+    "panel": (20, 24, 32),
+    "frame": (85, 100, 130),
+    "grid": (45, 55, 70),
+    "text": (230, 235, 240),
+    "subtext": (160, 170, 185),
+    "accent": (255, 205, 90),
+    "ok": (110, 220, 160),
+    "danger": (255, 115, 115),
+    "button_bg": (45, 55, 75),
+    "button_hover": (70, 90, 120),
+    "button_text": (240, 245, 250),
+}
+
+SHAPES = {
+    "I": [
+        [(0, 1), (1, 1), (2, 1), (3, 1)],
+        [(2, 0), (2, 1), (2, 2), (2, 3)],
+        [(0, 2), (1, 2), (2, 2), (3, 2)],
+        [(1, 0), (1, 1), (1, 2), (1, 3)],
+    ],
+    "J": [
+        [(0, 0), (0, 1), (1, 1), (2, 1)],
+        [(1, 0), (2, 0), (1, 1), (1, 2)],
+        [(0, 1), (1, 1), (2, 1), (2, 2)],
+        [(1, 0), (1, 1), (0, 2), (1, 2)],
+    ],
+    "L": [
+        [(2, 0), (0, 1), (1, 1), (2, 1)],
+        [(1, 0), (1, 1), (1, 2), (2, 2)],
+        [(0, 1), (1, 1), (2, 1), (0, 2)],
+        [(0, 0), (1, 0), (1, 1), (1, 2)],
+    ],
+    "O": [[(1, 0), (2, 0), (1, 1), (2, 1)]] * 4,
+    "S": [
+        [(1, 0), (2, 0), (0, 1), (1, 1)],
+        [(1, 0), (1, 1), (2, 1), (2, 2)],
+        [(1, 1), (2, 1), (0, 2), (1, 2)],
+        [(0, 0), (0, 1), (1, 1), (1, 2)],
+    ],
+    "T": [
+        [(1, 0), (0, 1), (1, 1), (2, 1)],
+        [(1, 0), (1, 1), (2, 1), (1, 2)],
+        [(0, 1), (1, 1), (2, 1), (1, 2)],
+        [(1, 0), (0, 1), (1, 1), (1, 2)],
+    ],
+    "Z": [
+        [(0, 0), (1, 0), (1, 1), (2, 1)],
+        [(2, 0), (1, 1), (2, 1), (1, 2)],
+        [(0, 1), (1, 1), (1, 2), (2, 2)],
+        [(1, 0), (0, 1), (1, 1), (0, 2)],
+    ],
+}
+
+
+# SRS kicks
+def build_srs_kicks():
+    kicks_jlstz = {
+        (0, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+        (1, 0): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+        (1, 2): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
+        (2, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
+        (2, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+        (3, 2): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+        (3, 0): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
+        (0, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
+    }
+    kicks_i = {
+        (0, 1): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+        (1, 0): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+        (1, 2): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+        (2, 1): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+        (2, 3): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
+        (3, 2): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
+        (3, 0): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
+        (0, 3): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
+    }
+    return kicks_jlstz, kicks_i
+
+
+KICKS_JLSTZ, KICKS_I = build_srs_kicks()
+
+
+# Placement table: PLACEMENT_TABLE[kind][rot][x + TABLE_X_OFF] -> (rows, left, right, top, bottom)
+# rows is ((dy, mask), ...) with mask already shifted to column x; mask is None when
+# that row of the piece sticks out of the walls. Extents are relative to (x, y).
+# Boards of other widths get their own table from placement_table(width).
+TABLE_X_OFF = 3
+TABLE_X_SPAN = GRID_W + TABLE_X_OFF
+
+
+def build_placement_entry(cells, x, width=GRID_W):
+    rows = []
+    for dy in sorted({cy for _, cy in cells}):
+        m = 0
+        for cx, cy in cells:
+            if cy != dy:
+                continue
+            if not 0 <= x + cx < width:
+                m = None
+                break
+            m |= 1 << (x + cx)
+        rows.append((dy, m))
+    xs = [cx for cx, _ in cells]
+    ys = [cy for _, cy in cells]
+    return tuple(rows), min(xs), max(xs), min(ys), max(ys)
+
+
+def build_placement_table(width=GRID_W):
+    table = {}
+    for kind, rots in SHAPES.items():
+        table[kind] = [
+            [
+                build_placement_entry(cells, x - TABLE_X_OFF, width)
+                for x in range(width + TABLE_X_OFF)
+            ]
+            for cells in rots
+        ]
+    return table
+
+
+PLACEMENT_TABLES = {GRID_W: build_placement_table()}
+PLACEMENT_TABLE = PLACEMENT_TABLES[GRID_W]
+
+
+def placement_table(width):
+    table = PLACEMENT_TABLES.get(width)
+    if table is None:
+        table = PLACEMENT_TABLES[width] = build_placement_table(width)
+    return table
+
+
+def placement_entry(kind, rot, x):
+    i = x + TABLE_X_OFF
+    if 0 <= i < TABLE_X_SPAN:
+        return PLACEMENT_TABLE[kind][rot][i]
+    return build_placement_entry(SHAPES[kind][rot], x)
+
+
+# Bottom profile: BOTTOM_PROFILE[kind][rot] -> ((cx, lowest cy), ...), one entry per
+# column the piece covers. Against the column heights this gives the drop distance
+# without stepping the piece down.
+def build_bottom_profile(cells):
+    low = {}
+    for cx, cy in cells:
+        low[cx] = max(cy, low.get(cx, cy))
+    return tuple(sorted(low.items()))
+
+
+BOTTOM_PROFILE = {
+    kind: [build_bottom_profile(cells) for cells in rots]
+    for kind, rots in SHAPES.items()
+}
+
+FULL_ROW = (1 << GRID_W) - 1
+
+# Board.cells holds one byte per cell, row-major: 0 when empty, else the code
+# of the piece that filled it. It is a flat bytearray so numpy (or anything
+# taking the buffer protocol) can view it without copying.
+CELL_CODES = {kind: i + 1 for i, kind in enumerate(SHAPES)}
+COLOR_CODES = {COLORS[kind]: code for kind, code in CELL_CODES.items()}
+
+
+# Zobrist hashing over rows: a board's hash is the XOR of row_key(y, mask) for
+# every row, so locking a piece or shifting rows only re-keys the rows touched.
+# Salts for rows past GRID_H are added by zobrist_salts(height) as taller
+# boards are created. Masks wider than 64 bits are folded in 64 bits at a time;
+# a mask that fits in one word (every GRID_W row) takes a single round, which
+# is what bot.hash_boards computes.
+MASK64 = (1 << 64) - 1
+ZOBRIST_SALTS = [random.Random(0x7E7215 + y).getrandbits(64) for y in range(GRID_H)]
+
+
+def zobrist_salts(height):
+    for y in range(len(ZOBRIST_SALTS), height):
+        ZOBRIST_SALTS.append(random.Random(0x7E7215 + y).getrandbits(64))
+
+
+def row_key(y, mask):
+    z = ZOBRIST_SALTS[y]
+    while True:
+        z = ((mask & MASK64) * 0x9E3779B97F4A7C15 + z) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        z ^= z >> 31
+        mask >>= 64
+        if not mask:
+            return z
+
+
+def zobrist(rows):
+    h = 0
+    for y, mask in enumerate(rows):
+        h ^= row_key(y, mask)
+    return h
+
+
+EMPTY_HASH = zobrist([0] * GRID_H)
+EMPTY_HASHES = {GRID_H: EMPTY_HASH}
+
+
+def empty_hash(height):
+    h = EMPTY_HASHES.get(height)
+    if h is None:
+        zobrist_salts(height)
+        h = EMPTY_HASHES[height] = zobrist([0] * height)
+    return h
+
+
+# Moves the rows between `top` (the highest non-empty row) and the lowest
+# cleared row down over the cleared ones in a single pass. The cleared row
+# objects are handed to blank() and reused as the new empty rows at the top,
+# so nothing above the stack is touched and no rows are allocated.
+def compact_rows(rows, full, top, blank):
+    cleared = [rows[r] for r in full]
+    write = full[-1]
+    skip = len(full) - 1
+    for read in range(full[-1], top - 1, -1):
+        if skip >= 0 and read == full[skip]:
+            skip -= 1
+        else:
+            rows[write] = rows[read]
+            write -= 1
+    for y in range(top, write + 1):
+        rows[y] = blank(cleared.pop())
+
+
+def new_bag(rng=random):
+    bag = list(SHAPES.keys())
+    rng.shuffle(bag)
+    return bag
+
+
+# ----------------------- Piece sequence -----------------------
+# A randomizer deals a seed's pieces: next() returns the next kind, peek(n) the
+# n after it without dealing them, and state() / set_state() capture it for
+# snapshots. RANDOMIZERS maps the names replays record to the classes.
+KINDS = tuple(SHAPES)
+BAG_PERMUTATIONS = math.factorial(len(KINDS))
+
+
+def mix64(z):
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+# Bag b of a seed is permutation number mix64(seed, b) % 7! of KINDS, read off
+# its factorial-base digits, so any bag is computed directly without dealing
+# the ones before it
+def seek_bag(seed, b):
+    z = (mix64(seed & MASK64) + (b + 1) * 0x9E3779B97F4A7C15) & MASK64
+    n = mix64(z) % BAG_PERMUTATIONS
+    pool = list(KINDS)
+    bag = []
+    for size in range(len(pool), 0, -1):
+        n, d = divmod(n, size)
+        bag.append(pool.pop(d))
+    return bag
+
+
+def piece_at(seed, k):
+    b, i = divmod(k, len(KINDS))
+    return seek_bag(seed, b)[i]
+
+
+# Seekable 7-bag: piece k is piece k % 7 of bag k // 7. State is the index of
+# the next piece to deal.
+class SevenBag:
+    def __init__(self, seed):
+        self.seed = seed
+        self.index = 0
+        self.bag_i = -1
+        self.bag = None
+
+    def piece(self, k):
+        b, i = divmod(k, len(KINDS))
+        if b != self.bag_i:
+            self.bag_i, self.bag = b, seek_bag(self.seed, b)
+        return self.bag[i]
+
+    def next(self):
+        kind = self.piece(self.index)
+        self.index += 1
+        return kind
+
+    def peek(self, n):
+        out = []
+        k = self.index
+        while len(out) < n:
+            b, i = divmod(k, len(KINDS))
+            out.extend(seek_bag(self.seed, b)[i:])
+            k = (b + 1) * len(KINDS)
+        return out[:n]
+
+    def seek(self, k):
+        self.index = k
+
+    def state(self):
+        return self.index
+
+    def set_state(self, index):
+        self.index = index
+
+
+# The sequence before seekable bags, kept so older replays still play back:
+# bags shuffled in turn by one random.Random(seed). Only dealt in order.
+class LegacyBag:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.bag = new_bag(self.rng)
+
+    def next(self):
+        if not self.bag:
+            self.bag = new_bag(self.rng)
+        return self.bag.pop()
+
+    def peek(self, n):
+        ahead = LegacyBag(0)
+        ahead.set_state(self.state())
+        return [ahead.next() for _ in range(n)]
+
+    def state(self):
+        return tuple(self.bag), self.rng.getstate()
+
+    def set_state(self, state):
+        self.bag = list(state[0])
+        self.rng.setstate(state[1])
+
+
+RANDOMIZERS = {"bag": SevenBag, "bag-v1": LegacyBag}
+DEFAULT_RANDOMIZER = "bag"
+
+
+# ----------------------- Core classes -----------------------
+# Movement checks candidate positions with Board.collides_at and then updates
+# the piece in place, so moving, rotating and falling build no Pieces
+class Piece:
+    __slots__ = ("kind", "rot", "x", "y")
+
+    def __init__(self, kind, x, y):
+        self.kind = kind
+        self.rot = 0
+        self.x = x
+        self.y = y
+
+    def blocks(self, ox=0, oy=0, rot=None):
+        r = self.rot if rot is None else rot
+        for cx, cy in SHAPES[self.kind][r]:
+            yield self.x + cx + ox, self.y + cy + oy
+
+    def clone(self):
+        p = Piece(self.kind, self.x, self.y)
+        p.rot = self.rot
+        return p
+
+
+class Board:
+    def __init__(self, width=GRID_W, height=GRID_H):
+        if width < MIN_BOARD_SIZE or height < MIN_BOARD_SIZE:
+            raise ValueError(
+                f"board must be at least {MIN_BOARD_SIZE}x{MIN_BOARD_SIZE}, "
+                f"got {width}x{height}"
+            )
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self.grid = [[None for _ in range(width)] for _ in range(height)]
+        self.cells = bytearray(width * height)
+        self.score = 0
+        self.lines = 0
+        self.level = 0
+        self.game_over = False
+        self.tetris_banner_timer = 0
+        self.last_clear_rows = 0
+        self.hash = empty_hash(height)
+        # Surface index: filled height of each column and the empty cells below
+        # its top, kept up to date by lock_piece and clear_lines
+        self.heights = [0] * width
+        self.holes = [0] * width
+
+    def row_mask(self, y):
+        return sum(1 << x for x, c in enumerate(self.grid[y]) if c is not None)
+
+    def inside(self, x, y):
+        return 0 <= x < self.width and y < self.height
+
+    # First row that can hold a filled cell; everything above it is empty
+    def stack_top(self):
+        return self.height - max(self.heights)
+
+    def collides(self, piece):
+        for x, y in piece.blocks():
+            if y < 0:
+                continue
+            if not self.inside(x, y) or (y >= 0 and self.grid[y][x] is not None):
+                return True
+        return False
+
+    def collides_at(self, kind, rot, x, y):
+        for cx, cy in SHAPES[kind][rot]:
+            gx, gy = x + cx, y + cy
+            if gy < 0:
+                continue
+            if not self.inside(gx, gy) or self.grid[gy][gx] is not None:
+                return True
+        return False
+
+    # O(columns covered) from the surface index while the piece is above every
+    # column it covers; a piece tucked under an overhang is stepped down instead
+    def drop_distance(self, piece):
+        x, y = piece.x, piece.y
+        heights = self.heights
+        width, height = self.width, self.height
+        d = height - y
+        for cx, cy in BOTTOM_PROFILE[piece.kind][piece.rot]:
+            gx = x + cx
+            if not 0 <= gx < width:
+                return self.scan_drop_distance(piece)
+            gap = height - heights[gx] - 1 - (y + cy)
+            if gap < 0:
+                return self.scan_drop_distance(piece)
+            if gap < d:
+                d = gap
+        return d
+
+    def scan_drop_distance(self, piece):
+        kind, rot, x, y = piece.kind, piece.rot, piece.x, piece.y
+        d = 0
+        while not self.collides_at(kind, rot, x, y + d + 1):
+            d += 1
+        return d
+
+    # ----- Surface index -----
+    def rebuild_surface(self):
+        self.heights = [0] * self.width
+        self.holes = [0] * self.width
+        for x in range(self.width):
+            self.rescan_column(x)
+
+    # `start` is a row known to be at or above the column's top
+    def rescan_column(self, x, start=0):
+        grid = self.grid
+        height = self.height
+        top = start
+        while top < height and grid[top][x] is None:
+            top += 1
+        self.heights[x] = height - top
+        self.holes[x] = sum(1 for y in range(top + 1, height) if grid[y][x] is None)
+
+    def surface_add(self, x, y):
+        h = self.height - y
+        if h > self.heights[x]:
+            self.holes[x] += h - self.heights[x] - 1
+            self.heights[x] = h
+        else:
+            self.holes[x] -= 1
+
+    # Cleared rows are full, so they sit at or below every column's top: a
+    # column just loses len(full) of height and keeps its holes, unless its top
+    # cell was cleared, in which case the new top has to be found. `top` is the
+    # stack top before the clear.
+    def surface_clear(self, full, top=0):
+        cleared = set(full)
+        heights = self.heights
+        height = self.height
+        for x in range(self.width):
+            if height - heights[x] in cleared:
+                self.rescan_column(x, top)
+            else:
+                heights[x] -= len(full)
+
+    def aggregate_height(self):
+        return sum(self.heights)
+
+    def bumpiness(self):
+        h = self.heights
+        return sum(abs(a - b) for a, b in zip(h, h[1:]))
+
+    def hole_count(self):
+        return sum(self.holes)
+
+    def lock_piece(self, piece):
+        for x, y in piece.blocks():
+            if y < 0:
+                self.game_over = True
+                return []
+            old = self.row_mask(y)
+            self.grid[y][x] = COLORS[piece.kind]
+            self.cells[y * self.width + x] = CELL_CODES[piece.kind]
+            self.hash ^= row_key(y, old) ^ row_key(y, old | 1 << x)
+            self.surface_add(x, y)
+        cleared = self.clear_lines()
+        self.update_score_and_level(len(cleared))
+        self.last_clear_rows = len(cleared)
+        if self.last_clear_rows == 4:
+            self.tetris_banner_timer = 1200
+        return cleared
+
+    def clear_lines(self):
+        grid = self.grid
+        top = self.stack_top()
+        full = [r for r in range(top, self.height) if None not in grid[r]]
+        if full:
+            # Only rows from the stack top down to the lowest cleared row move
+            moved = range(top, full[-1] + 1)
+            for y in moved:
+                self.hash ^= row_key(y, self.row_mask(y))
+            compact_rows(grid, full, top, self.blank_row)
+            self.compact_cells(full, top)
+            for y in moved:
+                self.hash ^= row_key(y, self.row_mask(y))
+            self.surface_clear(full, top)
+        return full
+
+    def blank_row(self, row):
+        for x in range(self.width):
+            row[x] = None
+        return row
+
+    # compact_rows for the flat cells: the kept rows between `top` and the
+    # lowest cleared row, shifted down under len(full) empty rows, written
+    # back in place so the buffer (and any view of it) stays the same object
+    def compact_cells(self, full, top):
+        w = self.width
+        cells = self.cells
+        cleared = set(full)
+        kept = b"".join(
+            cells[y * w : (y + 1) * w]
+            for y in range(top, full[-1] + 1)
+            if y not in cleared
+        )
+        cells[top * w : (full[-1] + 1) * w] = bytes(len(full) * w) + kept
+
+    def rebuild_cells(self):
+        self.cells[:] = bytes(COLOR_CODES.get(c, 0) for row in self.grid for c in row)
+
+    def update_score_and_level(self, nrows):
+        if nrows == 0:
+            return
+        add = {1: 100, 2: 300, 3: 500, 4: 800}.get(nrows, 0)
+        self.score += add * (self.level + 1)
+        self.lines += nrows
+        new_level = self.lines // LINES_PER_LEVEL
+        if new_level > self.level:
+            self.level = new_level
+
+
+# Same contract as Board; each row is an int bitmask, grid holds the colors
+class BitBoard(Board):
+    def __init__(self, width=GRID_W, height=GRID_H):
+        super().__init__(width, height)
+        self.rows = [0] * height
+        self.table = placement_table(width)
+        self.x_span = width + TABLE_X_OFF
+
+    def collides(self, piece):
+        return self.collides_at(piece.kind, piece.rot, piece.x, piece.y)
+
+    def row_mask(self, y):
+        return self.rows[y]
+
+    def entry(self, kind, rot, x):
+        i = x + TABLE_X_OFF
+        if 0 <= i < self.x_span:
+            return self.table[kind][rot][i]
+        return build_placement_entry(SHAPES[kind][rot], x, self.width)
+
+    def collides_at(self, kind, rot, x, y):
+        i = x + TABLE_X_OFF
+        if 0 <= i < self.x_span:
+            entry = self.table[kind][rot][i]
+        else:
+            entry = build_placement_entry(SHAPES[kind][rot], x, self.width)
+        rows = self.rows
+        height = self.height
+        for dy, m in entry[0]:
+            gy = y + dy
+            if gy < 0:
+                continue
+            if gy >= height or m is None or rows[gy] & m:
+                return True
+        return False
+
+    def scan_drop_distance(self, piece):
+        kind, rot, x, y = piece.kind, piece.rot, piece.x, piece.y
+        rows = self.rows
+        height = self.height
+        entry = self.entry(kind, rot, x)
+        d = 0
+        while True:
+            for dy, m in entry[0]:
+                gy = y + d + 1 + dy
+                if gy < 0:
+                    continue
+                if gy >= height or m is None or rows[gy] & m:
+                    return d
+            d += 1
+
+    def lock_piece(self, piece):
+        color = COLORS[piece.kind]
+        code = CELL_CODES[piece.kind]
+        cells, width = self.cells, self.width
+        for x, y in piece.blocks():
+            if y < 0:
+                self.game_over = True
+                return []
+            old = self.rows[y]
+            self.rows[y] = old | 1 << x
+            self.grid[y][x] = color
+            cells[y * width + x] = code
+            self.hash ^= row_key(y, old) ^ row_key(y, old | 1 << x)
+            self.surface_add(x, y)
+        cleared = self.clear_lines()
+        self.update_score_and_level(len(cleared))
+        self.last_clear_rows = len(cleared)
+        if self.last_clear_rows == 4:
+            self.tetris_banner_timer = 1200
+        return cleared
+
+    def rescan_column(self, x, start=0):
+        rows = self.rows
+        height = self.height
+        bit = 1 << x
+        top = start
+        while top < height and not rows[top] & bit:
+            top += 1
+        self.heights[x] = height - top
+        self.holes[x] = sum(1 for y in range(top + 1, height) if not rows[y] & bit)
+
+    def clear_lines(self):
+        rows = self.rows
+        full_row = self.full_row
+        top = self.stack_top()
+        full = [r for r in range(top, self.height) if rows[r] == full_row]
+        if not full:
+            return full
+        # Only rows from the stack top down to the lowest cleared row move
+        moved = range(top, full[-1] + 1)
+        for y in moved:
+            self.hash ^= row_key(y, rows[y])
+        compact_rows(rows, full, top, lambda row: 0)
+        compact_rows(self.grid, full, top, self.blank_row)
+        self.compact_cells(full, top)
+        for y in moved:
+            self.hash ^= row_key(y, rows[y])
+        self.surface_clear(full, top)
+        return full
+
+
+# ----------------------- Engine -----------------------
+(
+    ACTION_NONE,
+    ACTION_LEFT,
+    ACTION_RIGHT,
+    ACTION_SOFT_DROP,
+    ACTION_ROTATE_CW,
+    ACTION_ROTATE_CCW,
+    ACTION_HARD_DROP,
+    ACTION_HOLD,
+) = range(8)
+
+
+# Full game state as immutable values (see Engine.snapshot)
+Snapshot = namedtuple(
+    "Snapshot",
+    [
+        "rows",
+        "grid",
+        "score",
+        "lines",
+        "level",
+        "game_over",
+        "banner_timer",
+        "last_clear_rows",
+        "hash",
+        "current",
+        "queue",
+        "hold",
+        "hold_locked",
+        "drop_timer",
+        "fall_ms",
+        "paused",
+        "pieces",
+        "sequence",
+    ],
+)
+
+
+# The inputs of one game, enough to re-simulate it exactly: dts holds the dt of
+# every tick() and actions holds (tick, action), tick being the number of
+# tick() calls made before that step()
+class Recording:
+    def __init__(
+        self, seed, width=GRID_W, height=GRID_H, randomizer=DEFAULT_RANDOMIZER
+    ):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.randomizer = randomizer
+        self.dts = []
+        self.actions = []
+
+
+# queue holds the next `preview` pieces (at least VISIBLE_NEXT); peek(n) sees
+# further ahead than that without dealing anything
+class Engine:
+    def __init__(
+        self,
+        seed=None,
+        record=False,
+        width=GRID_W,
+        height=GRID_H,
+        randomizer=DEFAULT_RANDOMIZER,
+        preview=VISIBLE_NEXT,
+    ):
+        if randomizer not in RANDOMIZERS:
+            raise ValueError(f"unknown randomizer {randomizer!r}")
+        self.record = record
+        self.width = width
+        self.height = height
+        self.randomizer = randomizer
+        self.preview = max(preview, VISIBLE_NEXT)
+        # Pieces spawn centred the way SPAWN_X centres them on GRID_W
+        self.spawn_x = SPAWN_X + (width - GRID_W) // 2
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        # Always play from a known seed so every game can be replayed
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.recording = (
+            Recording(seed, self.width, self.height, self.randomizer)
+            if self.record
+            else None
+        )
+        self.board = BitBoard(self.width, self.height)
+        self.sequence = RANDOMIZERS[self.randomizer](seed)
+        self.queue = deque(self.sequence.next() for _ in range(self.preview))
+        self.current = self.spawn_piece()
+        self.hold = None
+        self.hold_locked = False
+        self.drop_timer = 0
+        self.fall_ms = INITIAL_FALL_MS
+        self.paused = False
+        self.pieces = 0
+
+    def snapshot(self):
+        b = self.board
+        c = self.current
+        return Snapshot(
+            tuple(b.rows),
+            tuple(tuple(row) for row in b.grid),
+            b.score,
+            b.lines,
+            b.level,
+            b.game_over,
+            b.tetris_banner_timer,
+            b.last_clear_rows,
+            b.hash,
+            (c.kind, c.rot, c.x, c.y),
+            tuple(self.queue),
+            self.hold,
+            self.hold_locked,
+            self.drop_timer,
+            self.fall_ms,
+            self.paused,
+            self.pieces,
+            self.sequence.state(),
+        )
+
+    # The recording, if any, is left alone
+    def restore(self, snap):
+        b = self.board = BitBoard(self.width, self.height)
+        b.rows = list(snap.rows)
+        b.grid = [list(row) for row in snap.grid]
+        b.score, b.lines, b.level = snap.score, snap.lines, snap.level
+        b.game_over = snap.game_over
+        b.tetris_banner_timer = snap.banner_timer
+        b.last_clear_rows = snap.last_clear_rows
+        b.hash = snap.hash
+        b.rebuild_surface()
+        b.rebuild_cells()
+        kind, rot, x, y = snap.current
+        self.current = Piece(kind, x, y)
+        self.current.rot = rot
+        self.queue = deque(snap.queue)
+        self.hold = snap.hold
+        self.hold_locked = snap.hold_locked
+        self.drop_timer = snap.drop_timer
+        self.fall_ms = snap.fall_ms
+        self.paused = snap.paused
+        self.pieces = snap.pieces
+        self.sequence.set_state(snap.sequence)
+
+    # Hooks for front-ends
+    def on_lock(self, nrows):
+        pass
+
+    def on_game_over(self):
+        pass
+
+    def step(self, action):
+        if self.board.game_over or self.paused:
+            return 0, self.board.game_over
+        if self.recording is not None:
+            self.recording.actions.append((len(self.recording.dts), action))
+        score = self.board.score
+        if action == ACTION_LEFT:
+            self.try_move(-1, 0)
+        elif action == ACTION_RIGHT:
+            self.try_move(1, 0)
+        elif action == ACTION_SOFT_DROP:
+            self.soft_drop()
+        elif action == ACTION_ROTATE_CW:
+            self.rotate(+1)
+        elif action == ACTION_ROTATE_CCW:
+            self.rotate(-1)
+        elif action == ACTION_HARD_DROP:
+            self.hard_drop()
+        elif action == ACTION_HOLD:
+            self.hold_piece()
+        return self.board.score - score, self.board.game_over
+
+    def tick(self, dt_ms):
+        if self.board.game_over or self.paused:
+            return 0, self.board.game_over
+        if self.recording is not None:
+            self.recording.dts.append(dt_ms)
+        score = self.board.score
+        self.tick_gravity(dt_ms)
+        return self.board.score - score, self.board.game_over
+
+    # The next n pieces to spawn, the queue first and then further on
+    def peek(self, n):
+        if n <= len(self.queue):
+            return list(islice(self.queue, n))
+        return list(self.queue) + self.sequence.peek(n - len(self.queue))
+
+    def spawn_piece(self):
+        kind = self.queue.popleft()
+        self.queue.append(self.sequence.next())
+        p = Piece(kind, x=self.spawn_x, y=SPAWN_Y)
+        if self.board.collides(p):
+            self.board.game_over = True
+        return p
+
+    def try_move(self, dx, dy):
+        p = self.current
+        if self.board.collides_at(p.kind, p.rot, p.x + dx, p.y + dy):
+            return False
+        p.x += dx
+        p.y += dy
+        return True
+
+    def rotate(self, direction):
+        p = self.current
+        r_from = p.rot
+        r_to = (p.rot + direction) % 4
+        kicks = KICKS_I if p.kind == "I" else KICKS_JLSTZ
+        for dx, dy in kicks.get((r_from, r_to), [(0, 0)]):
+            if not self.board.collides_at(p.kind, r_to, p.x + dx, p.y + dy):
+                p.rot = r_to
+                p.x += dx
+                p.y += dy
+                return
+
+    def soft_drop(self):
+        self.try_move(0, 1)
+
+    def hard_drop(self):
+        self.current.y += self.board.drop_distance(self.current)
+        self.lock_current()
+
+    def lock_current(self):
+        self.board.lock_piece(self.current)
+        self.pieces += 1
+        self.on_lock(self.board.last_clear_rows)
+        self.update_speed()
+        self.hold_locked = False
+        if not self.board.game_over:
+            self.current = self.spawn_piece()
+        else:
+            self.on_game_over()
+
+    def update_speed(self):
+        self.fall_ms = max(
+            MIN_FALL_MS, INITIAL_FALL_MS - self.board.level * LEVEL_SPEEDUP_MS
+        )
+
+    def hold_piece(self):
+        if self.hold_locked:
+            return
+        if self.hold is None:
+            self.hold = self.current.kind
+            self.current = self.spawn_piece()
+        else:
+            self.hold, self.current.kind = self.current.kind, self.hold
+            self.current.rot = 0
+            self.current.x, self.current.y = self.spawn_x, SPAWN_Y
+            if self.board.collides(self.current):
+                self.board.game_over = True
+                self.on_game_over()
+        self.hold_locked = True
+
+    def tick_gravity(self, dt):
+        if self.board.game_over or self.paused:
+            return
+        self.drop_timer += dt
+        while self.drop_timer >= self.fall_ms:
+            self.drop_timer -= self.fall_ms
+            if not self.try_move(0, 1):
+                self.lock_current()
+                break
+
+        if self.board.tetris_banner_timer > 0:
+            self.board.tetris_banner_timer = max(0, self.board.tetris_banner_timer - dt)
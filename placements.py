@@ -0,0 +1,299 @@
+import marshal
+from collections import deque, namedtuple
+
+from engine import (
+    BOTTOM_PROFILE,
+    FULL_ROW,
+    GRID_H,
+    GRID_W,
+    KICKS_I,
+    KICKS_JLSTZ,
+    PLACEMENT_TABLE,
+    SHAPES,
+    SPAWN_X,
+    SPAWN_Y,
+    TABLE_X_OFF,
+    TABLE_X_SPAN,
+    ACTION_HARD_DROP,
+    ACTION_LEFT,
+    ACTION_RIGHT,
+    ACTION_ROTATE_CCW,
+    ACTION_ROTATE_CW,
+    ACTION_SOFT_DROP,
+)
+from ttable import TranspositionTable
+
+# rows: ((gy, mask), ...) of the locked cells; path: actions from spawn, ending in a hard drop
+Placement = namedtuple("Placement", ["kind", "rot", "x", "y", "rows", "path"])
+
+ROTATE_PATHS = (
+    (),
+    (ACTION_ROTATE_CW,),
+    (ACTION_ROTATE_CW, ACTION_ROTATE_CW),
+    (ACTION_ROTATE_CCW,),
+)
+
+
+def build_canonical_rotations():
+    # Rotations whose cells are not a translation of an earlier rotation's
+    canon = {}
+    for kind, rots in SHAPES.items():
+        seen = set()
+        canon[kind] = []
+        for rot, cells in enumerate(rots):
+            mx = min(cx for cx, _ in cells)
+            my = min(cy for _, cy in cells)
+            shape = frozenset((cx - mx, cy - my) for cx, cy in cells)
+            if shape not in seen:
+                seen.add(shape)
+                canon[kind].append(rot)
+    return canon
+
+
+CANONICAL_ROTATIONS = build_canonical_rotations()
+
+
+def _open_path(rot, x, y):
+    shift = x - SPAWN_X
+    moves = (ACTION_RIGHT,) * shift if shift > 0 else (ACTION_LEFT,) * -shift
+    return ROTATE_PATHS[rot] + moves + (ACTION_SOFT_DROP,) * (y - SPAWN_Y)
+
+
+def build_open_paths():
+    # OPEN_PATHS[kind][rot][x + TABLE_X_OFF]: rotate at spawn, shift, hard drop
+    paths = {}
+    for kind in SHAPES:
+        paths[kind] = [
+            [
+                _open_path(rot, x - TABLE_X_OFF, SPAWN_Y) + (ACTION_HARD_DROP,)
+                for x in range(TABLE_X_SPAN)
+            ]
+            for rot in range(4)
+        ]
+    return paths
+
+
+OPEN_PATHS = build_open_paths()
+
+CACHE_SIZE = 65536
+cache = TranspositionTable(CACHE_SIZE)
+
+
+def board_rows(board):
+    rows = getattr(board, "rows", None)
+    if rows is not None:
+        return tuple(rows)
+    return tuple(
+        sum(1 << x for x in range(GRID_W) if board.grid[y][x] is not None)
+        for y in range(GRID_H)
+    )
+
+
+def lock_rows(rows, placement):
+    rows = list(rows)
+    for gy, m in placement.rows:
+        rows[gy] |= m
+    kept = [r for r in rows if r != FULL_ROW]
+    cleared = GRID_H - len(kept)
+    return (0,) * cleared + tuple(kept), cleared
+
+
+def enumerate_placements(board, kind):
+    return placements_for_rows(board_rows(board), kind)
+
+
+# Results depend only on the row masks, which for an overhang-free stack are
+# exactly its column-height surface, so the cache is keyed on them directly.
+# Entries are kept marshalled to bytes, which the cyclic GC never tracks, so
+# a full cache adds nothing to the full collections that would otherwise stall
+# play; Placement namedtuples are built per call.
+def placements_for_rows(rows, kind):
+    key = (kind, rows)
+    found = cache.get(key)
+    if found is None:
+        found = marshal.dumps(_search(rows, kind))
+        cache.put(key, found)
+    return list(map(Placement._make, marshal.loads(found)))
+
+
+def clear_cache():
+    cache.clear()
+
+
+def cache_stats():
+    return cache.stats()
+
+
+def column_tops(rows):
+    tops = [GRID_H] * GRID_W
+    for y in range(GRID_H - 1, -1, -1):
+        r = rows[y]
+        while r:
+            low = r & -r
+            tops[low.bit_length() - 1] = y
+            r ^= low
+    return tops
+
+
+# Search over (rot, x, y) using Board.collides semantics and Engine.rotate's
+# kick order. With a clear spawn area, every state between spawn height and
+# the straight-drop landing of its (rot, x) column is reachable ("open"), so
+# those columns are filled in from column tops and the state-by-state BFS only
+# runs for tucks, slides and kicks that leave the open region. States whose
+# cells poke through a wall above the top edge are legal in Board.collides but
+# never lead anywhere useful, so they are not expanded.
+def _search(rows, kind):
+    table = PLACEMENT_TABLE[kind]
+    kicks = KICKS_I if kind == "I" else KICKS_JLSTZ
+
+    def free(rot, x, y):
+        i = x + TABLE_X_OFF
+        if not 0 <= i < TABLE_X_SPAN:
+            return y + table[rot][0][0][-1][0] < 0
+        for dy, m in table[rot][i][0]:
+            gy = y + dy
+            if gy < 0:
+                continue
+            if gy >= GRID_H or m is None or rows[gy] & m:
+                return False
+        return True
+
+    def walled(rot, x):
+        bottom = BOTTOM_PROFILE[kind][rot]
+        lo, hi = bottom[0][0], bottom[-1][0]
+        return -lo <= x < GRID_W - hi
+
+    def kicked(rot, x, y, direction):
+        r_to = (rot + direction) % 4
+        for dx, dy in kicks.get((rot, r_to), [(0, 0)]):
+            if free(r_to, x + dx, y + dy):
+                return r_to, x + dx, y + dy
+        return None
+
+    def neighbours(state):
+        rot, x, y = state
+        for action, dx, dy in (
+            (ACTION_LEFT, -1, 0),
+            (ACTION_RIGHT, 1, 0),
+            (ACTION_SOFT_DROP, 0, 1),
+        ):
+            if free(rot, x + dx, y + dy):
+                yield action, (rot, x + dx, y + dy)
+        for action, direction in ((ACTION_ROTATE_CW, 1), (ACTION_ROTATE_CCW, -1)):
+            nxt = kicked(rot, x, y, direction)
+            if nxt is not None:
+                yield action, nxt
+
+    results = []
+    seen_cells = set()
+
+    def add(rot, x, y, path):
+        cells = tuple((y + dy, m) for dy, m in table[rot][x + TABLE_X_OFF][0] if m)
+        # Locking with a cell above the top edge ends the game
+        if cells[0][0] < 0 or cells in seen_cells:
+            return
+        seen_cells.add(cells)
+        end = len(path)
+        while end and path[end - 1] == ACTION_SOFT_DROP:
+            end -= 1
+        path = path[:end] + (ACTION_HARD_DROP,)
+        results.append((kind, rot, x, y, cells, path))
+
+    parent = {}
+    todo = deque()
+    if rows[0] or rows[1]:
+        start = (0, SPAWN_X, SPAWN_Y)
+        if not free(*start):
+            return []
+        parent[start] = None
+        todo.append(start)
+        landing = {}
+    else:
+        tops = column_tops(rows)
+        landing = {}
+        for rot in range(4):
+            bottom = BOTTOM_PROFILE[kind][rot]
+            for x in range(-bottom[0][0], GRID_W - bottom[-1][0]):
+                landing[rot, x] = min([tops[x + cx] - cy for cx, cy in bottom]) - 1
+        # Straight drops of translated rotations lock the same cells
+        for rot in CANONICAL_ROTATIONS[kind]:
+            bottom = BOTTOM_PROFILE[kind][rot]
+            paths = OPEN_PATHS[kind][rot]
+            entries = table[rot]
+            for x in range(-bottom[0][0], GRID_W - bottom[-1][0]):
+                y = landing[rot, x]
+                cells = tuple([(y + dy, m) for dy, m in entries[x + TABLE_X_OFF][0]])
+                if cells[0][0] < 0 or cells in seen_cells:
+                    continue
+                seen_cells.add(cells)
+                results.append((kind, rot, x, y, cells, paths[x + TABLE_X_OFF]))
+        # A free state outside the open region must touch a cavity (an empty
+        # cell under its column top), so only moves near cavities can seed the BFS.
+        covered = 0
+        cavity_cols = 0
+        cavity_rows = []
+        for y in range(GRID_H):
+            covered |= rows[y]
+            if covered & ~rows[y]:
+                cavity_cols |= covered & ~rows[y]
+                cavity_rows.append(y)
+        if cavity_rows:
+            c0 = (cavity_cols & -cavity_cols).bit_length() - 1
+            c1 = cavity_cols.bit_length() - 1
+            y0 = max(SPAWN_Y, cavity_rows[0] - 5)
+            y1 = cavity_rows[-1] + 2
+        for (rot, x), land in landing.items() if cavity_rows else ():
+            # Kicks reach 2 cells and shapes span 4, so targets cover x - 2 .. x + 5
+            if x + 5 < c0 or x - 2 > c1:
+                continue
+            bottom = BOTTOM_PROFILE[kind][rot]
+            top_y, bottom_y = y0, min(land, y1)
+            for dx, action in ((-1, ACTION_LEFT), (1, ACTION_RIGHT)):
+                other = landing.get((rot, x + dx))
+                if other is None:
+                    continue
+                if x + dx + bottom[-1][0] < c0 or x + dx + bottom[0][0] > c1:
+                    continue
+                for y in range(max(top_y, other + 1), bottom_y + 1):
+                    nxt = (rot, x + dx, y)
+                    if nxt not in parent and free(*nxt):
+                        parent[nxt] = ((rot, x, y), action)
+                        todo.append(nxt)
+            for action, direction in ((ACTION_ROTATE_CW, 1), (ACTION_ROTATE_CCW, -1)):
+                other = landing.get(((rot + direction) % 4, x), SPAWN_Y - 1)
+                for y in range(max(top_y, other + 1), bottom_y + 1):
+                    nxt = kicked(rot, x, y, direction)
+                    if nxt is None or nxt in parent or not walled(nxt[0], nxt[1]):
+                        continue
+                    land_to = landing[nxt[0], nxt[1]]
+                    if SPAWN_Y <= nxt[2] <= land_to:
+                        continue
+                    parent[nxt] = ((rot, x, y), action)
+                    todo.append(nxt)
+
+    def is_open(rot, x, y):
+        land = landing.get((rot, x))
+        return land is not None and SPAWN_Y <= y <= land
+
+    while todo:
+        state = todo.popleft()
+        for action, nxt in neighbours(state):
+            if nxt in parent or not walled(nxt[0], nxt[1]) or is_open(*nxt):
+                continue
+            parent[nxt] = (state, action)
+            todo.append(nxt)
+        rot, x, y = state
+        if not free(rot, x, y + 1):
+            add(rot, x, y, _path(parent, state))
+    return results
+
+
+def _path(parent, state):
+    actions = []
+    while parent.get(state) is not None:
+        state, action = parent[state]
+        actions.append(action)
+    actions.reverse()
+    if state != (0, SPAWN_X, SPAWN_Y):
+        return _open_path(*state) + tuple(actions)
+    return tuple(actions)
@@ -0,0 +1,144 @@
+import csv
+import json
+import time
+from collections import deque
+
+# ----------------------- Settings -----------------------
+PROFILE_WINDOW = 600  # samples per phase kept for rolling percentiles
+TRACE_LIMIT = 200000  # most recent timed events kept for export
+HISTOGRAM_EDGES_MS = (1, 2, 4, 8, 12, 16.7, 25, 33.3, 50, 100)
+EXPORT_FORMATS = ("csv", "json", "chrome")
+
+
+class _Phase:
+    __slots__ = ("prof", "name", "start")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.add(self.name, self.start, time.perf_counter_ns())
+
+
+# Per-phase wall-clock timers. Each phase keeps a rolling window of durations
+# (ms) for percentiles; every timed event is also kept, up to TRACE_LIMIT, as
+# (frame, name, start_ns, dur_ns) for export. "frame" is the work done between
+# begin_frame and end_frame.
+class FrameProfiler:
+    def __init__(self, window=PROFILE_WINDOW, trace_limit=TRACE_LIMIT):
+        self.window = window
+        self.samples = {}
+        self.events = deque(maxlen=trace_limit)
+        self.frame = 0
+        self.origin = time.perf_counter_ns()
+        self.frame_start = None
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if self.frame_start is not None:
+            self.add("frame", self.frame_start, time.perf_counter_ns())
+            self.frame_start = None
+        self.frame += 1
+
+    def add(self, name, start_ns, end_ns):
+        self.record(name, (end_ns - start_ns) / 1e6)
+        start = start_ns - self.origin
+        self.events.append((self.frame, name, start, end_ns - start_ns))
+
+    # A duration measured elsewhere (e.g. the clock's frame interval)
+    def record(self, name, ms):
+        found = self.samples.get(name)
+        if found is None:
+            found = self.samples[name] = deque(maxlen=self.window)
+        found.append(ms)
+
+    def percentiles(self, name, qs=(50, 95, 99)):
+        data = sorted(self.samples.get(name, ()))
+        if not data:
+            return [0.0 for _ in qs]
+        return [data[min(len(data) - 1, int(q / 100.0 * len(data)))] for q in qs]
+
+    # Counts per bucket: [< edges[0], [edges[0], edges[1]), ..., >= edges[-1]]
+    def histogram(self, name="frame", edges=HISTOGRAM_EDGES_MS):
+        counts = [0] * (len(edges) + 1)
+        for ms in self.samples.get(name, ()):
+            i = 0
+            while i < len(edges) and ms >= edges[i]:
+                i += 1
+            counts[i] += 1
+        return counts
+
+    def summary(self):
+        out = {}
+        for name, data in self.samples.items():
+            p50, p95, p99 = self.percentiles(name)
+            out[name] = {
+                "count": len(data),
+                "mean_ms": round(sum(data) / len(data), 4) if data else 0.0,
+                "p50_ms": round(p50, 4),
+                "p95_ms": round(p95, 4),
+                "p99_ms": round(p99, 4),
+                "max_ms": round(max(data), 4) if data else 0.0,
+            }
+        return out
+
+    def export(self, path, fmt=None):
+        if fmt is None:
+            fmt = "csv" if path.endswith(".csv") else "json"
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown profile format: {fmt}")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                w = csv.writer(f)
+                w.writerow(["frame", "phase", "start_ms", "dur_ms"])
+                for frame, name, start, dur in self.events:
+                    w.writerow([frame, name, start / 1e6, dur / 1e6])
+            elif fmt == "json":
+                json.dump(
+                    {
+                        "frames": self.frame,
+                        "summary": self.summary(),
+                        "histogram_edges_ms": list(HISTOGRAM_EDGES_MS),
+                        "histogram": self.histogram(),
+                        "events": [list(e) for e in self.events],
+                    },
+                    f,
+                )
+            else:
+                # Chrome trace-event format (chrome://tracing, Perfetto)
+                json.dump(
+                    {
+                        "traceEvents": [
+                            {
+                                "name": name,
+                                "ph": "X",
+                                "ts": start / 1000.0,
+                                "dur": dur / 1000.0,
+                                "pid": 0,
+                                "tid": 0,
+                                "args": {"frame": frame},
+                            }
+                            for frame, name, start, dur in self.events
+                        ],
+                        "displayTimeUnit": "ms",
+                    },
+                    f,
+                )
+
+    def overlay_lines(self, names):
+        lines = []
+        for name in names:
+            if name in self.samples:
+                p50, p95, p99 = self.percentiles(name)
+                lines.append(f"{name:<9}{p50:6.2f}{p95:6.2f}{p99:6.2f}")
+        return lines
@@ -0,0 +1,287 @@
+import argparse
+import bisect
+import operator
+import sys
+import zlib
+
+from engine import GRID_H, GRID_W, RANDOMIZERS, Engine, Recording
+
+# ----------------------- Format -----------------------
+# MAGIC, then varints: seed (zigzagged, so it may be negative), score, lines,
+# level, pieces, tick count, action count, board width, board height,
+# randomizer; then a zlib body of the tick dts (zigzag deltas from the previous
+# dt) followed by the actions as (tick delta, action) varint pairs. With a
+# steady frame rate the dt deltas are mostly 0, so a game compresses to a few
+# KB. Older files are still read: MAGIC_V2 files have no randomizer (always
+# "bag-v1") and MAGIC_V1 files no board size either (always GRID_W x GRID_H).
+MAGIC = b"TRP3"
+MAGIC_V2 = b"TRP2"
+MAGIC_V1 = b"TRP1"
+HEADER_FIELDS = {MAGIC: 10, MAGIC_V2: 9, MAGIC_V1: 7}
+RANDOMIZER_CODES = {"bag-v1": 0, "bag": 1}  # never renumber
+RANDOMIZER_NAMES = {code: name for name, code in RANDOMIZER_CODES.items()}
+REPLAY_EXT = ".trp"
+
+KEYFRAME_SPACING = 600  # ticks between keyframes (10 s at 60 FPS)
+
+
+# Unsigned ints only; signed values go through zigzag() first
+def write_varint(out, n):
+    n = operator.index(n)
+    if n < 0:
+        raise ValueError(f"varints are unsigned, got {n}")
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n):
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+
+class Replay:
+    def __init__(self, recording, score, lines, level, pieces):
+        self.recording = recording
+        self.score = score
+        self.lines = lines
+        self.level = level
+        self.pieces = pieces
+
+    @classmethod
+    def from_engine(cls, engine):
+        b = engine.board
+        return cls(engine.recording, b.score, b.lines, b.level, engine.pieces)
+
+    def encode(self):
+        rec = self.recording
+        body = bytearray()
+        prev = 0
+        for dt in rec.dts:
+            write_varint(body, zigzag(dt - prev))
+            prev = dt
+        prev = 0
+        for tick, action in rec.actions:
+            write_varint(body, tick - prev)
+            write_varint(body, action)
+            prev = tick
+        out = bytearray(MAGIC)
+        for n in (
+            zigzag(rec.seed),
+            self.score,
+            self.lines,
+            self.level,
+            self.pieces,
+            len(rec.dts),
+            len(rec.actions),
+            rec.width,
+            rec.height,
+            RANDOMIZER_CODES[rec.randomizer],
+        ):
+            write_varint(out, n)
+        return bytes(out) + zlib.compress(bytes(body), 9)
+
+    @classmethod
+    def decode(cls, data):
+        magic = data[: len(MAGIC)]
+        if magic not in HEADER_FIELDS:
+            raise ValueError("not a replay file")
+        pos = len(MAGIC)
+        header = []
+        for _ in range(HEADER_FIELDS[magic]):
+            n, pos = read_varint(data, pos)
+            header.append(n)
+        if magic == MAGIC_V1:
+            header += [GRID_W, GRID_H]
+        if magic != MAGIC:
+            header.append(RANDOMIZER_CODES["bag-v1"])
+        seed, score, lines, level, pieces, n_ticks, n_actions, width, height, code = (
+            header
+        )
+        seed = unzigzag(seed)
+        randomizer = RANDOMIZER_NAMES.get(code)
+        if randomizer not in RANDOMIZERS:
+            raise ValueError(f"unknown randomizer code {code}")
+        body = zlib.decompress(data[pos:])
+        rec = Recording(seed, width, height, randomizer)
+        pos = prev = 0
+        for _ in range(n_ticks):
+            n, pos = read_varint(body, pos)
+            prev += unzigzag(n)
+            rec.dts.append(prev)
+        prev = 0
+        for _ in range(n_actions):
+            n, pos = read_varint(body, pos)
+            action, pos = read_varint(body, pos)
+            prev += n
+            rec.actions.append((prev, action))
+        return cls(rec, score, lines, level, pieces)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.decode(f.read())
+
+
+# ----------------------- Playback -----------------------
+# Re-simulates a recording at full speed; returns the engine after `ticks`
+# ticks (and the actions before the next one), or at the end of the replay
+def simulate(recording, ticks=None, engine=None):
+    if engine is None:
+        engine = Engine(
+            recording.seed,
+            width=recording.width,
+            height=recording.height,
+            randomizer=recording.randomizer,
+        )
+    actions = recording.actions
+    dts = recording.dts
+    end = len(dts) if ticks is None else min(ticks, len(dts))
+    i = 0
+    for t in range(end + 1):
+        while i < len(actions) and actions[i][0] == t:
+            engine.step(actions[i][1])
+            i += 1
+        if t < end:
+            engine.tick(dts[t])
+    return engine
+
+
+# Seekable playback. Position t means t ticks played plus every action tagged
+# t, the same state simulate(recording, t) reaches. A keyframe is stored every
+# `spacing` ticks as playback first passes it; seek() restores the nearest one
+# at or before the target and simulates only the rest. Snapshot grid rows and
+# sequence states equal to ones already stored are shared, not copied, so
+# keyframes cost little more than the rows that changed.
+class ReplayPlayer:
+    def __init__(self, replay, spacing=KEYFRAME_SPACING):
+        self.recording = replay.recording
+        self.spacing = max(1, spacing)
+        rec = self.recording
+        self.engine = Engine(
+            rec.seed, width=rec.width, height=rec.height, randomizer=rec.randomizer
+        )
+        self.start = self.engine.snapshot()
+        self.keyframes = []
+        self.key_ticks = []
+        self.rows_pool = {}
+        self.sequence = None
+        self.rewind()
+
+    @property
+    def length(self):
+        return len(self.recording.dts)
+
+    def rewind(self):
+        self.engine.restore(self.start)
+        self.tick = 0
+        self.action_i = 0
+        self.apply_actions()
+        self.store_keyframe()
+
+    def apply_actions(self):
+        actions = self.recording.actions
+        i = self.action_i
+        while i < len(actions) and actions[i][0] == self.tick:
+            self.engine.step(actions[i][1])
+            i += 1
+        self.action_i = i
+
+    def store_keyframe(self):
+        if self.tick % self.spacing:
+            return
+        if self.key_ticks and self.key_ticks[-1] >= self.tick:
+            return
+        snap = self.engine.snapshot()
+        pool = self.rows_pool
+        grid = tuple([pool.setdefault(row, row) for row in snap.grid])
+        if snap.sequence == self.sequence:
+            sequence = self.sequence
+        else:
+            sequence = self.sequence = snap.sequence
+        snap = snap._replace(grid=grid, sequence=sequence)
+        self.keyframes.append((self.tick, self.action_i, snap))
+        self.key_ticks.append(self.tick)
+
+    def advance(self):
+        if self.tick >= self.length:
+            return False
+        self.engine.tick(self.recording.dts[self.tick])
+        self.tick += 1
+        self.apply_actions()
+        self.store_keyframe()
+        return True
+
+    def seek(self, tick):
+        tick = max(0, min(tick, self.length))
+        k = bisect.bisect_right(self.key_ticks, tick) - 1
+        key_tick, action_i, snap = self.keyframes[k]
+        if not key_tick <= self.tick <= tick:
+            self.engine.restore(snap)
+            self.tick, self.action_i = key_tick, action_i
+        while self.tick < tick:
+            self.advance()
+        return self.engine
+
+    # Simulates to the end, storing every keyframe, so later seeks are bounded
+    # by `spacing` ticks
+    def build_keyframes(self):
+        self.seek(self.length)
+        return len(self.keyframes)
+
+
+def verify(replay):
+    e = simulate(replay.recording)
+    b = e.board
+    got = (b.score, b.lines, b.level, e.pieces)
+    want = (replay.score, replay.lines, replay.level, replay.pieces)
+    return got == want, got, want
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-simulate and verify replays")
+    parser.add_argument("paths", nargs="+", help="replay files")
+    parser.add_argument(
+        "--seek", type=int, help="print the state of each replay at this tick"
+    )
+    parser.add_argument("--keyframe-spacing", type=int, default=KEYFRAME_SPACING)
+    args = parser.parse_args()
+    if args.seek is not None:
+        for path in args.paths:
+            e = ReplayPlayer(Replay.load(path), args.keyframe_spacing).seek(args.seek)
+            b = e.board
+            print(
+                f"{path}: tick {args.seek} score {b.score} lines {b.lines} "
+                f"level {b.level} pieces {e.pieces}"
+            )
+        sys.exit()
+    failed = 0
+    for path in args.paths:
+        try:
+            ok, got, want = verify(Replay.load(path))
+        except (OSError, ValueError, IndexError, zlib.error) as e:
+            ok, got, want = False, f"unreadable ({e})", None
+        if not ok:
+            failed += 1
+            print(f"MISMATCH {path}: got {got}, recorded {want}")
+    print(f"{len(args.paths) - failed}/{len(args.paths)} replays verified")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,332 @@
+import argparse
+import bisect
+import heapq
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+from atomicfile import write_atomic
+
+# ----------------------- Settings -----------------------
+SCORE_FILE = "tetris_scores.json"
+RECENT_KEPT = 50  # most recent runs kept in memory for the scoreboard
+WRITE_BATCH = 64  # most runs written per flush of the writer thread
+SQLITE_EXTS = (".db", ".sqlite", ".sqlite3")
+
+
+# Runs are {"time": "YYYY-MM-DD HH:MM", "score": int, "level": int}. add() only
+# updates the in-memory view (high, recent) and queues the run; a background
+# thread writes queued runs in batches. Queries see every run added so far.
+# A batch that fails to save is reported on stderr and dropped; the writer
+# carries on, so flush() and close() always return.
+class ScoreStore(ABC):
+    def __init__(self):
+        self.recent = deque(maxlen=RECENT_KEPT)
+        self.high = 0
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def add(self, entry):
+        self.high = max(self.high, entry.get("score", 0))
+        self.recent.append(entry)
+        self.pending.put(entry)
+
+    # Blocks until every queued run is on disk
+    def flush(self):
+        self.pending.join()
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+
+    def _write_loop(self):
+        try:
+            self._open_writer()
+        except Exception as e:
+            self._report("open", e)
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [e for e in batch if e is not None]
+            done = len(entries) < len(batch)
+            try:
+                if entries:
+                    try:
+                        self._write(entries)
+                    except Exception as e:
+                        self._report(f"save {len(entries)} run(s) to", e)
+                if done:
+                    try:
+                        self._close_writer()
+                    except Exception as e:
+                        self._report("close", e)
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+            if done:
+                return
+
+    def _report(self, what, error):
+        print(f"scores: could not {what} {self.path}: {error!r}", file=sys.stderr)
+
+    def _open_writer(self):
+        pass
+
+    def _close_writer(self):
+        pass
+
+    @abstractmethod
+    def _write(self, entries):
+        pass
+
+    # Queries
+    @abstractmethod
+    def top(self, n=10):
+        pass
+
+    # Percentage of stored runs scoring at or below `score`
+    @abstractmethod
+    def percentile_rank(self, score):
+        pass
+
+    # [{"day", "games", "best", "mean", "max_level"}, ...] oldest day first
+    @abstractmethod
+    def daily(self):
+        pass
+
+
+# Every run as one JSON line, appended per batch so a save never rewrites
+# older runs. A {"high": H} line keeps a high no stored run reaches (carried
+# over from the older single-document format, which is converted on open).
+# A line torn by a crash is skipped when the file is read.
+class JsonScoreStore(ScoreStore):
+    def __init__(self, path=SCORE_FILE):
+        self.path = path
+        high, history, legacy = load_json_scores(path)
+        if legacy:
+            write_atomic(path, json_lines(high, history))
+        self.history = history
+        self.sorted_scores = sorted(e.get("score", 0) for e in history)
+        self.out = None
+        super().__init__()
+        self.high = max([high] + self.sorted_scores[-1:])
+        self.recent.extend(history[-RECENT_KEPT:])
+
+    def add(self, entry):
+        self.history.append(entry)
+        bisect.insort(self.sorted_scores, entry.get("score", 0))
+        super().add(entry)
+
+    def _write(self, entries):
+        if self.out is None:
+            self.out = open(self.path, "a", encoding="utf-8")
+            # Start clear of a line torn by a crash
+            if self.out.tell() > 0 and not ends_with_newline(self.path):
+                self.out.write("\n")
+        self.out.write(json_lines(0, entries))
+        self.out.flush()
+
+    def _close_writer(self):
+        if self.out is not None:
+            self.out.close()
+
+    def top(self, n=10):
+        return heapq.nlargest(n, self.history, key=lambda e: e.get("score", 0))
+
+    def percentile_rank(self, score):
+        if not self.sorted_scores:
+            return 0.0
+        at_or_below = bisect.bisect_right(self.sorted_scores, score)
+        return 100.0 * at_or_below / len(self.sorted_scores)
+
+    def daily(self):
+        days = {}
+        for e in self.history:
+            day = e.get("time", "")[:10]
+            d = days.setdefault(day, [0, 0, 0, 0])
+            d[0] += 1
+            d[1] = max(d[1], e.get("score", 0))
+            d[2] += e.get("score", 0)
+            d[3] = max(d[3], e.get("level", 0))
+        return [
+            {
+                "day": day,
+                "games": g,
+                "best": best,
+                "mean": round(total / g, 1),
+                "max_level": lv,
+            }
+            for day, (g, best, total, lv) in sorted(days.items())
+        ]
+
+
+class SqliteScoreStore(ScoreStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS scores ("
+        "id INTEGER PRIMARY KEY, time TEXT NOT NULL, "
+        "score INTEGER NOT NULL, level INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS scores_score ON scores (score)",
+        "CREATE INDEX IF NOT EXISTS scores_level ON scores (level)",
+        "CREATE INDEX IF NOT EXISTS scores_time ON scores (time)",
+    )
+
+    def __init__(self, path):
+        self.path = path
+        # Reads use this connection; the writer thread opens its own
+        self.db = sqlite3.connect(path)
+        for sql in self.SCHEMA:
+            self.db.execute(sql)
+        self.db.commit()
+        super().__init__()
+        self.high = self.db.execute(
+            "SELECT COALESCE(MAX(score), 0) FROM scores"
+        ).fetchone()[0]
+        rows = self.db.execute(
+            "SELECT time, score, level FROM scores ORDER BY id DESC LIMIT ?",
+            (RECENT_KEPT,),
+        ).fetchall()
+        self.recent.extend(
+            {"time": t, "score": s, "level": lv} for t, s, lv in reversed(rows)
+        )
+
+    def _open_writer(self):
+        self.wdb = sqlite3.connect(self.path)
+
+    def _close_writer(self):
+        self.wdb.close()
+
+    def _write(self, entries):
+        with self.wdb:
+            self.wdb.executemany(
+                "INSERT INTO scores (time, score, level) VALUES (?, ?, ?)",
+                [
+                    (e.get("time", ""), e.get("score", 0), e.get("level", 0))
+                    for e in entries
+                ],
+            )
+
+    def close(self):
+        super().close()
+        self.db.close()
+
+    def top(self, n=10):
+        self.flush()
+        rows = self.db.execute(
+            "SELECT time, score, level FROM scores ORDER BY score DESC LIMIT ?", (n,)
+        ).fetchall()
+        return [{"time": t, "score": s, "level": lv} for t, s, lv in rows]
+
+    def percentile_rank(self, score):
+        self.flush()
+        total = self.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        at_or_below = self.db.execute(
+            "SELECT COUNT(*) FROM scores WHERE score <= ?", (score,)
+        ).fetchone()[0]
+        return 100.0 * at_or_below / total if total else 0.0
+
+    def daily(self):
+        self.flush()
+        rows = self.db.execute(
+            "SELECT substr(time, 1, 10) AS day, COUNT(*), MAX(score), AVG(score), "
+            "MAX(level) FROM scores GROUP BY day ORDER BY day"
+        ).fetchall()
+        return [
+            {
+                "day": day,
+                "games": g,
+                "best": best,
+                "mean": round(mean, 1),
+                "max_level": lv,
+            }
+            for day, g, best, mean, lv in rows
+        ]
+
+
+# (high, history, legacy) of a JSON score file, every run it holds; legacy is
+# True for the older single {"high", "history"} document. (0, [], False) when
+# it is missing or unreadable
+def load_json_scores(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return 0, [], False
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and "history" in data:
+        return data.get("high", 0), list(data["history"]), True
+    high, history = 0, []
+    for line in text.splitlines():
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(item, dict):
+            continue
+        if "score" in item:
+            history.append(item)
+        else:
+            high = max(high, item.get("high", 0))
+    return high, history, False
+
+
+def ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+# The JSON-lines form of (high, history)
+def json_lines(high, history):
+    lines = [json.dumps(e, separators=(",", ":")) for e in history]
+    if high > max([0] + [e.get("score", 0) for e in history]):
+        lines.insert(0, json.dumps({"high": high}))
+    return "".join(line + "\n" for line in lines)
+
+
+# SQLite for .db/.sqlite paths, the JSON file otherwise
+def open_store(path=SCORE_FILE):
+    if path.lower().endswith(SQLITE_EXTS):
+        return SqliteScoreStore(path)
+    return JsonScoreStore(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the score history")
+    parser.add_argument("--scores", default=SCORE_FILE, help="JSON or SQLite file")
+    parser.add_argument("--top", type=int, metavar="N", help="best N runs")
+    parser.add_argument("--rank", type=int, metavar="SCORE", help="percentile rank")
+    parser.add_argument("--daily", action="store_true", help="per-day aggregates")
+    parser.add_argument(
+        "--import-json", metavar="PATH", help="append the runs of a JSON score file"
+    )
+    args = parser.parse_args()
+    store = open_store(args.scores)
+    try:
+        if args.import_json:
+            _, history, _ = load_json_scores(args.import_json)
+            for entry in history:
+                store.add(entry)
+            store.flush()
+        result = {}
+        if args.top:
+            result["top"] = store.top(args.top)
+        if args.rank is not None:
+            result["percentile_rank"] = round(store.percentile_rank(args.rank), 2)
+        if args.daily:
+            result["daily"] = store.daily()
+        print(json.dumps(result, indent=2))
+    finally:
+        store.close()
@@ -0,0 +1,293 @@
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bot import Bot, hash_boards, load_weights, score_boards
+from engine import Engine, zobrist, ACTION_HOLD
+from placements import board_rows, placements_for_rows
+from ttable import TranspositionTable
+
+# ----------------------- Settings -----------------------
+BEAM_WIDTH = 8
+BEAM_DEPTH = 3
+PLAN_BUDGET_MS = 12
+EXPAND_TT_SIZE = 4096
+
+
+# ----------------------- Nodes -----------------------
+# A node is (value, bonus, rows, cur, hold, i, actions, h): value ranks the
+# beam, bonus is the weighted lines cleared so far, cur is the piece in hand,
+# i the next index into the known sequence, actions the inputs of the root
+# move and h the Zobrist hash of rows.
+def expand(node, seq, can_hold=True):
+    _, bonus, rows, cur, hold, i, actions, h = node
+    nxt = seq[i] if i < len(seq) else None
+    options = [(cur, hold, nxt, i + 1, False)]
+    if can_hold:
+        if hold is None and nxt is not None:
+            after = seq[i + 1] if i + 1 < len(seq) else None
+            options.append((nxt, cur, after, i + 2, True))
+        elif hold is not None and hold != cur:
+            options.append((hold, cur, nxt, i + 1, True))
+    return options
+
+
+# Every placement of each (rows, h, kind) request, locked and scored, as
+# (paths, boards, lines, board values, board hashes). A board expands the
+# same whichever ply or piece reaches it, so results are cached by (h, kind)
+# in tt and the next piece's search starts from boards this one already
+# expanded. Entries keep only the placements' paths, tuples of ints the cyclic
+# GC soon stops tracking. Misses are locked and scored together in one
+# vectorized pass. Returns None as soon as `deadline` passes.
+def successors(requests, board_w, tt, deadline=None):
+    out = [None] * len(requests)
+    fresh, miss, bases, placed = [], [], [], []
+    for n, (rows, h, kind) in enumerate(requests):
+        found = tt.get((h, kind)) if tt is not None else None
+        if found is not None:
+            out[n] = found
+            continue
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        ps = placements_for_rows(rows, kind)
+        out[n] = (tuple(p.path for p in ps), None, None, None, None)
+        fresh.append(n)
+        if ps:
+            miss.append(n)
+            bases.extend([rows] * len(ps))
+            placed.extend(ps)
+    if deadline is not None and time.perf_counter() > deadline:
+        return None
+    if placed:
+        boards, lines = Bot.lock_candidates(np.array(bases, dtype=np.uint32), placed)
+        values = score_boards(boards, np.zeros(len(placed)), board_w)
+        hashes = hash_boards(boards)
+        start = 0
+        for n in miss:
+            paths = out[n][0]
+            end = start + len(paths)
+            out[n] = (
+                paths,
+                boards[start:end],
+                lines[start:end],
+                values[start:end],
+                hashes[start:end],
+            )
+            start = end
+    if tt is not None:
+        for n in fresh:
+            rows, h, kind = requests[n]
+            tt.put((h, kind), out[n])
+    return out
+
+
+def root_node(engine):
+    rows = board_rows(engine.board)
+    h = getattr(engine.board, "hash", None)
+    if h is None:
+        h = zobrist(rows)
+    return (0.0, 0.0, rows, engine.current.kind, engine.hold, 0, None, h)
+
+
+# Returns the last fully expanded layer (best first) and its depth
+def beam_search(
+    roots, seq, weights, width, depth, deadline, root_can_hold=True, tt=None
+):
+    done, done_depth = [], 0
+    layer = roots
+    lines_w = weights.get("lines", 0.0)
+    board_w = {k: v for k, v in weights.items() if k != "lines"}
+    for d in range(depth):
+        requests, expansions = [], []
+        for node in layer:
+            if node[3] is None:
+                continue
+            for option in expand(node, seq, root_can_hold or d > 0):
+                requests.append((node[2], node[7], option[0]))
+                expansions.append((node, option))
+        # Anytime: a ply is abandoned once the budget is gone, but the first
+        # is always finished so there is a move to return
+        found_all = successors(requests, board_w, tt, deadline if d > 0 else None)
+        if found_all is None:
+            return done, done_depth
+        children, parts = [], []
+        for (node, option), found in zip(expansions, found_all):
+            paths, boards, lines, values, hashes = found
+            if not paths:
+                continue
+            _, hold, cur, i, held = option
+            children.extend((node, path, hold, cur, i, held) for path in paths)
+            parts.append((boards, lines, values, hashes, node[1]))
+        if not children:
+            break
+        boards = np.concatenate([part[0] for part in parts])
+        lines = np.concatenate([part[1] for part in parts])
+        hashes = np.concatenate([part[3] for part in parts]).tolist()
+        bonus = np.concatenate(
+            [np.full(len(part[1]), part[4]) for part in parts]
+        ) + lines_w * lines
+        values = np.concatenate([part[2] for part in parts]) + bonus
+        # Dominated states: same board, hold and queue position, lower value
+        ranked = {}
+        for j in np.argsort(-values):
+            node, path, hold, cur, i, held = children[j]
+            key = (hashes[j], hold, cur, i)
+            if key in ranked:
+                continue
+            actions = node[6]
+            if actions is None:
+                actions = ((ACTION_HOLD,) if held else ()) + path
+            ranked[key] = (
+                float(values[j]),
+                float(bonus[j]),
+                tuple(boards[j].tolist()),
+                cur,
+                hold,
+                i,
+                actions,
+                hashes[j],
+            )
+            if len(ranked) >= width:
+                break
+        layer = list(ranked.values())
+        done, done_depth = layer, d + 1
+    return done, done_depth
+
+
+# Each worker process keeps its own expansion cache between jobs
+_worker_tt, _worker_weights = None, None
+
+
+def _worker(args):
+    global _worker_tt, _worker_weights
+    roots, seq, weights, width, depth, budget_s = args
+    if _worker_tt is None or _worker_weights != weights:
+        _worker_tt, _worker_weights = TranspositionTable(EXPAND_TT_SIZE), weights
+    deadline = time.perf_counter() + budget_s
+    layer, d = beam_search(
+        roots, seq, weights, width, depth, deadline, tt=_worker_tt
+    )
+    return (layer[0] if layer else None), d
+
+
+# ----------------------- Planner -----------------------
+class BeamPlanner(Bot):
+    def __init__(
+        self,
+        weights=None,
+        width=BEAM_WIDTH,
+        depth=BEAM_DEPTH,
+        budget_ms=PLAN_BUDGET_MS,
+        workers=1,
+    ):
+        super().__init__(weights)
+        self.width = width
+        self.depth = depth
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        self.last_depth = 0
+        self.tt = TranspositionTable(EXPAND_TT_SIZE)
+
+    def plan(self, engine):
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        seq = list(engine.queue)
+        root = root_node(engine)
+        can_hold = self.use_hold and not engine.hold_locked
+        if self.pool is None:
+            layer, self.last_depth = beam_search(
+                [root],
+                seq,
+                self.weights,
+                self.width,
+                self.depth,
+                deadline,
+                can_hold,
+                self.tt,
+            )
+            return list(layer[0][6]) if layer else []
+
+        # Split the first ply across workers; each runs its own beam below it
+        first, _ = beam_search(
+            [root],
+            seq,
+            self.weights,
+            self.width * self.workers,
+            1,
+            deadline,
+            can_hold,
+            self.tt,
+        )
+        if not first:
+            return []
+        budget = max(0.0, deadline - time.perf_counter())
+        jobs = [
+            (first[k :: self.workers], seq, self.weights, self.width, self.depth - 1, budget)
+            for k in range(min(self.workers, len(first)))
+        ]
+        best, best_depth = first[0], 1
+        for result, d in self.pool.map(_worker, jobs):
+            if result is None:
+                continue
+            if d + 1 > best_depth or (d + 1 == best_depth and result[0] > best[0]):
+                best, best_depth = result, d + 1
+        self.last_depth = best_depth
+        return list(best[6])
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+def run_headless(pieces, seed=None, weights=None, **planner_args):
+    engine = Engine(seed)
+    planner = BeamPlanner(weights, **planner_args)
+    start = time.perf_counter()
+    depths = []
+    try:
+        for _ in range(pieces):
+            if engine.board.game_over:
+                break
+            planner.play_piece(engine)
+            depths.append(planner.last_depth)
+    finally:
+        planner.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "pieces": engine.pieces,
+        "seconds": round(elapsed, 3),
+        "ms_per_piece": round(1000 * elapsed / max(1, engine.pieces), 2),
+        "mean_depth": round(sum(depths) / max(1, len(depths)), 2),
+        "score": engine.board.score,
+        "lines": engine.board.lines,
+        "level": engine.board.level,
+        "game_over": engine.board.game_over,
+        "expand_cache": planner.tt.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the beam-search bot headless")
+    parser.add_argument("--pieces", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--weights", help="JSON file of feature weights")
+    parser.add_argument("--width", type=int, default=BEAM_WIDTH)
+    parser.add_argument("--depth", type=int, default=BEAM_DEPTH)
+    parser.add_argument("--budget-ms", type=float, default=PLAN_BUDGET_MS)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+    w = load_weights(args.weights) if args.weights else None
+    result = run_headless(
+        args.pieces,
+        args.seed,
+        w,
+        width=args.width,
+        depth=args.depth,
+        budget_ms=args.budget_ms,
+        workers=args.workers,
+    )
+    print(json.dumps(result, indent=2))
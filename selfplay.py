@@ -0,0 +1,381 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from atomicfile import write_atomic
+from bot import Bot, load_weights
+from engine import (
+    CELL_CODES,
+    GRID_H,
+    GRID_W,
+    VISIBLE_NEXT,
+    ACTION_HOLD,
+    DEFAULT_RANDOMIZER,
+    Engine,
+)
+
+# ----------------------- Settings -----------------------
+SHARDS = 32
+FILE_RECORDS = 1 << 20  # records per file; a shard fills its files in turn
+CHUNK_GAMES = 8  # games per task
+MAX_PIECES = 2000  # a game is cut off after this many pieces
+MANIFEST = "manifest.json"
+PROGRESS_S = 2.0  # at most one progress line per this many seconds
+
+# One placement per record, fixed size. The state is the board and pieces the
+# player saw before the move: row masks (bit x = column x), the piece in hand,
+# HOLD and the NEXT queue as CELL_CODES (0 = none). The placement is the
+# locked piece, which differs from `current` when `held` is set; reward is the
+# score it earned. done: 1 topped out, 2 cut off at max_pieces.
+ROW_DTYPE = "<u2" if GRID_W <= 16 else "<u4"
+RECORD = np.dtype(
+    [
+        ("seed", "<u8"),
+        ("piece", "<u4"),
+        ("rows", ROW_DTYPE, (GRID_H,)),
+        ("current", "u1"),
+        ("hold", "u1"),
+        ("next", "u1", (VISIBLE_NEXT,)),
+        ("kind", "u1"),
+        ("rot", "u1"),
+        ("x", "i1"),
+        ("y", "i1"),
+        ("held", "u1"),
+        ("reward", "<i4"),
+        ("lines", "u1"),
+        ("done", "u1"),
+    ]
+)
+
+
+# ----------------------- Games -----------------------
+# Notes the locked piece, which lock_current() still holds when on_lock runs
+class SelfPlayEngine(Engine):
+    def on_lock(self, nrows):
+        c = self.current
+        self.placed = (c.kind, c.rot, c.x, c.y)
+
+
+# Plays one game with the bot, taking a random placement instead with
+# probability epsilon; yields a RECORD tuple per piece
+def play_game(bot, seed, max_pieces=MAX_PIECES, epsilon=0.0):
+    engine = SelfPlayEngine(seed)
+    rng = random.Random(seed)
+    board = engine.board
+    while not board.game_over and engine.pieces < max_pieces:
+        state = (
+            seed,
+            engine.pieces,
+            tuple(board.rows),
+            CELL_CODES[engine.current.kind],
+            CELL_CODES.get(engine.hold, 0),
+            tuple(CELL_CODES[k] for k in engine.peek(VISIBLE_NEXT)),
+        )
+        score, pieces = board.score, engine.pieces
+        if epsilon and rng.random() < epsilon:
+            _, cands = bot.candidates(engine)
+            actions = list(rng.choice(cands)[0]) if cands else []
+        else:
+            actions = bot.plan(engine)
+        actions = bot.play_plan(engine, actions)
+        if engine.pieces == pieces:
+            break
+        kind, rot, x, y = engine.placed
+        if board.game_over:
+            done = 1
+        else:
+            done = 2 if engine.pieces == max_pieces else 0
+        held = int(bool(actions) and actions[0] == ACTION_HOLD)
+        reward = board.score - score
+        yield state + (
+            CELL_CODES[kind],
+            rot,
+            x,
+            y,
+            held,
+            reward,
+            board.last_clear_rows,
+            done,
+        )
+
+
+# ----------------------- Shards -----------------------
+# Game i (seed + i) always belongs to shard i % shards, so a dataset's content
+# depends only on its parameters, never on worker count, timing or resumes.
+def shard_games(shard, shards, games):
+    return range(shard, games, shards)
+
+
+def shard_file(shard, part):
+    return f"shard{shard:04d}-{part:04d}.npy"
+
+
+# Appends records to a shard's files, starting a new FILE_RECORDS file when the
+# last one is full. files is the shard's manifest entry: [[name, records], ...].
+class ShardWriter:
+    def __init__(self, out_dir, shard, files, file_records=FILE_RECORDS):
+        self.out_dir = out_dir
+        self.shard = shard
+        self.files = [list(f) for f in files]
+        self.file_records = file_records
+        self.array = None
+        if self.files and self.files[-1][1] < file_records:
+            path = os.path.join(out_dir, self.files[-1][0])
+            self.array = np.lib.format.open_memmap(path, mode="r+")
+
+    def next_file(self):
+        if self.array is not None:
+            self.array.flush()
+        name = shard_file(self.shard, len(self.files))
+        self.array = np.lib.format.open_memmap(
+            os.path.join(self.out_dir, name),
+            mode="w+",
+            dtype=RECORD,
+            shape=(self.file_records,),
+        )
+        self.files.append([name, 0])
+
+    def write(self, record):
+        if self.array is None or self.files[-1][1] == self.file_records:
+            self.next_file()
+        entry = self.files[-1]
+        self.array[entry[1]] = record
+        entry[1] += 1
+
+    def close(self):
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+
+
+# Pool task: plays games [start, start + count) of a shard's sequence and
+# returns the shard's new file list once every record is flushed to disk, so
+# the manifest never counts records that are not there
+def _worker(args):
+    out_dir, shard, shards, start, count, files, params = args
+    t0 = time.perf_counter()
+    bot = Bot(params["weights"])
+    writer = ShardWriter(out_dir, shard, files, params["file_records"])
+    seeds = shard_games(shard, shards, params["games"])[start : start + count]
+    records = 0
+    try:
+        for i in seeds:
+            for record in play_game(
+                bot, params["seed"] + i, params["max_pieces"], params["epsilon"]
+            ):
+                writer.write(record)
+                records += 1
+    finally:
+        writer.close()
+    stats = {
+        "pid": os.getpid(),
+        "games": len(seeds),
+        "records": records,
+        "seconds": time.perf_counter() - t0,
+    }
+    return shard, len(seeds), writer.files, stats
+
+
+# ----------------------- Manifest -----------------------
+# {"params": {...}, "record": dtype, "shards": [{"games_done", "files"}, ...]},
+# rewritten with write_atomic after every finished task
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(out_dir, manifest):
+    write_atomic(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=1))
+
+
+# Every parameter but the game count must match to resume; more games extend
+# each shard's sequence
+def resume_manifest(out_dir, params):
+    manifest = load_manifest(out_dir)
+    if manifest is None:
+        return {
+            "params": params,
+            "record": str(RECORD.descr),
+            "shards": [{"games_done": 0, "files": []} for _ in range(params["shards"])],
+        }
+    old = manifest["params"]
+    changed = [k for k in params if k != "games" and old.get(k) != params[k]]
+    if manifest["record"] != str(RECORD.descr):
+        changed.append("record")
+    if changed:
+        raise ValueError(f"{out_dir} was generated with different {', '.join(changed)}")
+    manifest["params"]["games"] = max(old["games"], params["games"])
+    return manifest
+
+
+# The dataset as read-only memmaps, one per file, each cut to the records
+# written
+def open_dataset(out_dir):
+    manifest = load_manifest(out_dir)
+    if manifest is None:
+        raise ValueError(f"no {MANIFEST} in {out_dir}")
+    out = []
+    for shard in manifest["shards"]:
+        for name, n in shard["files"]:
+            if n:
+                out.append(np.load(os.path.join(out_dir, name), mmap_mode="r")[:n])
+    return out
+
+
+# ----------------------- Generation -----------------------
+# Shards are worked on a chunk of games at a time. A shard has at most one task
+# in flight (its files are appended in order) and the pool at most 2 x workers,
+# so the parent only hands out work as finished chunks are flushed and
+# recorded: generation never runs further ahead of the manifest, or of the
+# disk, than that window. Records never pass through the parent.
+def generate(
+    out_dir,
+    games,
+    seed=0,
+    shards=SHARDS,
+    workers=None,
+    chunk=CHUNK_GAMES,
+    file_records=FILE_RECORDS,
+    max_pieces=MAX_PIECES,
+    epsilon=0.0,
+    weights=None,
+    log=None,
+):
+    os.makedirs(out_dir, exist_ok=True)
+    params = {
+        "seed": seed,
+        "games": games,
+        "shards": shards,
+        "file_records": file_records,
+        "max_pieces": max_pieces,
+        "epsilon": epsilon,
+        "weights": weights,
+        "randomizer": DEFAULT_RANDOMIZER,
+    }
+    manifest = resume_manifest(out_dir, params)
+    params = manifest["params"]
+    games = params["games"]
+    state = manifest["shards"]
+    workers = workers or os.cpu_count()
+
+    def remaining(s):
+        return len(shard_games(s, shards, games)) - state[s]["games_done"]
+
+    todo = [s for s in range(shards) if remaining(s) > 0]
+    todo.reverse()
+    total = sum(len(shard_games(s, shards, games)) for s in range(shards))
+    done_games = total - sum(remaining(s) for s in range(shards))
+    per_worker = {}
+    inflight = {}
+    start = last_log = time.perf_counter()
+    records = 0
+    with ProcessPoolExecutor(workers) as pool:
+        while todo or inflight:
+            while todo and len(inflight) < 2 * workers:
+                s = todo.pop()
+                job = (
+                    out_dir,
+                    s,
+                    shards,
+                    state[s]["games_done"],
+                    min(chunk, remaining(s)),
+                    state[s]["files"],
+                    params,
+                )
+                inflight[pool.submit(_worker, job)] = s
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                del inflight[fut]
+                shard, n, files, stats = fut.result()
+                state[shard]["games_done"] += n
+                state[shard]["files"] = files
+                if remaining(shard) > 0:
+                    todo.insert(0, shard)
+                done_games += n
+                records += stats["records"]
+                w = per_worker.setdefault(
+                    stats["pid"], {"games": 0, "records": 0, "seconds": 0.0}
+                )
+                for key in w:
+                    w[key] += stats[key]
+            save_manifest(out_dir, manifest)
+            now = time.perf_counter()
+            if log is not None and now - last_log >= PROGRESS_S:
+                last_log = now
+                print(
+                    f"{done_games}/{total} games, {records} records, "
+                    f"{records / (now - start):.0f} records/s",
+                    file=log,
+                )
+    elapsed = time.perf_counter() - start
+    return {
+        "games": total,
+        "records": sum(n for st in state for _, n in st["files"]),
+        "new_records": records,
+        "seconds": round(elapsed, 3),
+        "records_per_sec": round(records / elapsed, 1) if elapsed else 0.0,
+        "workers": [
+            {
+                "pid": pid,
+                "games": w["games"],
+                "records": w["records"],
+                "busy_seconds": round(w["seconds"], 3),
+                "records_per_sec": round(w["records"] / w["seconds"], 1),
+            }
+            for pid, w in sorted(per_worker.items())
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate (state, placement, reward) records by bot self-play"
+    )
+    parser.add_argument("out", help="dataset directory; an existing one is resumed")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="game i plays seed + i")
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--shards", type=int, default=SHARDS)
+    parser.add_argument("--chunk", type=int, default=CHUNK_GAMES, help="games per task")
+    parser.add_argument(
+        "--file-records",
+        type=int,
+        default=FILE_RECORDS,
+        help="records per shard file",
+    )
+    parser.add_argument("--max-pieces", type=int, default=MAX_PIECES)
+    parser.add_argument(
+        "--epsilon",
+        type=float,
+        default=0.0,
+        help="chance of a random placement instead of the bot's",
+    )
+    parser.add_argument("--weights", help="JSON file of bot feature weights")
+    args = parser.parse_args()
+    w = load_weights(args.weights) if args.weights else None
+    try:
+        result = generate(
+            args.out,
+            args.games,
+            seed=args.seed,
+            shards=args.shards,
+            workers=args.workers,
+            chunk=args.chunk,
+            file_records=args.file_records,
+            max_pieces=args.max_pieces,
+            epsilon=args.epsilon,
+            weights=w,
+            log=sys.stderr,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(result, indent=2))
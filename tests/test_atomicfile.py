@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+import atomicfile
+from atomicfile import write_atomic
+
+
+def test_write_atomic_keeps_the_file_mode(tmp_path):
+    path = tmp_path / "f.json"
+    path.write_text("old")
+    path.chmod(0o644)
+    write_atomic(str(path), "new")
+    assert path.read_text() == "new"
+    assert (path.stat().st_mode & 0o777) == 0o644
+
+
+def test_write_atomic_gives_a_new_file_the_umask_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        write_atomic(str(tmp_path / "f.json"), "new")
+    finally:
+        os.umask(umask)
+    assert ((tmp_path / "f.json").stat().st_mode & 0o777) == 0o644
+
+
+# An interrupt between writing and replacing leaves the old file and no temp
+def test_write_atomic_cleans_up_when_interrupted(tmp_path, monkeypatch):
+    path = tmp_path / "f.json"
+    path.write_text("old")
+
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(atomicfile.os, "replace", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        write_atomic(str(path), "new")
+    assert os.listdir(tmp_path) == ["f.json"]
+    assert path.read_text() == "old"
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from engine import (
+    BOTTOM_PROFILE,
+    COLORS,
+    GRID_H,
+    GRID_W,
+    KICKS_I,
+    KICKS_JLSTZ,
+    SHAPES,
+    SPAWN_Y,
+    TABLE_X_OFF,
+    BitBoard,
+    Board,
+    Engine,
+    Piece,
+    row_key,
+    zobrist,
+)
+
+SIZES = [(GRID_W, GRID_H), (7, 9)]
+
+
+# BitBoard's table lookups against the SHAPES-driven Board for every SRS kick
+@pytest.mark.parametrize("width, height", SIZES)
+def test_placement_table_matches_shapes(width, height):
+    rng = random.Random(0)
+    for trial in range(6 if width == GRID_W else 2):
+        ref, bb = Board(width, height), BitBoard(width, height)
+        fill = 0 if trial == 0 else rng.random() * 0.6
+        for y in range(height // 3, height):
+            for x in range(width):
+                if rng.random() < fill:
+                    ref.grid[y][x] = bb.grid[y][x] = COLORS["ghost"]
+                    bb.rows[y] |= 1 << x
+        ref.rebuild_surface()
+        bb.rebuild_surface()
+        for kind in SHAPES:
+            kicks = KICKS_I if kind == "I" else KICKS_JLSTZ
+            for (r_from, r_to), offsets in kicks.items():
+                for x in range(-TABLE_X_OFF - 2, width + 2):
+                    for y in range(-4, height + 1):
+                        for dx, dy in offsets:
+                            p = Piece(kind, x + dx, y + dy)
+                            p.rot = r_to
+                            got = bb.collides_at(kind, r_to, x + dx, y + dy)
+                            assert got == ref.collides(p), (kind, r_to, x + dx, y + dy)
+                        p = Piece(kind, x, y)
+                        p.rot = r_from
+                        if ref.collides(p):
+                            continue
+                        g = p.clone()
+                        while not ref.collides(g):
+                            g.y += 1
+                        want = g.y - 1 - p.y
+                        assert bb.drop_distance(p) == want, (kind, r_from, x, y)
+                        assert ref.drop_distance(p) == want, (kind, r_from, x, y)
+
+
+def landing_score(board, p, rng):
+    covered = sum(
+        board.height - board.heights[p.x + cx] - 1 - (p.y + cy)
+        for cx, cy in BOTTOM_PROFILE[p.kind][p.rot]
+    )
+    return p.y - 4 * covered + rng.random()
+
+
+# Plays games of mostly low, hole-free placements (so lines get cleared) mixed
+# with random ones (so holes and overhangs form), checking the incremental
+# surface index and cells against a rescan of the grid after every lock
+@pytest.mark.parametrize("width, height", SIZES)
+def test_surface_index_matches_rescan(width, height):
+    rng = random.Random(0)
+    for game in range(20 if width == GRID_W else 4):
+        e = Engine(game, width=width, height=height)
+        while not e.board.game_over:
+            b = e.board
+            kind = e.current.kind
+            options = []
+            for rot in range(4):
+                for x in range(-TABLE_X_OFF, width):
+                    p = Piece(kind, x, SPAWN_Y)
+                    p.rot = rot
+                    if b.collides(p):
+                        continue
+                    p.y += b.scan_drop_distance(p)
+                    if all(0 <= gx < width for gx, _ in p.blocks()):
+                        options.append(p)
+            if not options:
+                break
+            if rng.random() < 0.05:
+                e.current = rng.choice(options)
+            else:
+                e.current = max(options, key=lambda p: landing_score(b, p, rng))
+            e.hard_drop()
+            got = (list(b.heights), list(b.holes))
+            b.rebuild_surface()
+            assert got == (b.heights, b.holes), game
+            cells = bytes(b.cells)
+            b.rebuild_cells()
+            assert cells == b.cells, game
+
+
+# Rows wider than 64 columns must hash every column, or a lock past column 63
+# leaves board.hash (and everything keyed on it) unchanged
+def test_wide_board_hash_covers_every_column():
+    assert row_key(0, 1 << 64) != row_key(0, 0)
+    assert row_key(0, 1 << 130 | 1) != row_key(0, 1)
+    e = Engine(0, width=200, height=40)
+    for x in (0, 63, 64, 88, 150, 196):
+        before = e.board.hash
+        e.current = Piece("O", x, SPAWN_Y)
+        e.hard_drop()
+        assert e.board.hash != before, x
+        assert e.board.hash == zobrist(e.board.rows), x
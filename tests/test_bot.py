@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bot import FEATURES, Bot, hash_boards, run_headless
+from engine import GRID_H, GRID_W, ZOBRIST_SALTS, Engine, zobrist, zobrist_salts
+
+
+# With every weight zero the first candidate wins, which may only hold; the
+# piece must still be placed rather than the game stalling
+def test_play_piece_always_places_a_piece():
+    bot = Bot({f: 0.0 for f in FEATURES})
+    for seed in range(3):
+        engine = Engine(seed)
+        while not engine.board.game_over:
+            pieces = engine.pieces
+            bot.play_piece(engine)
+            assert engine.pieces > pieces or engine.board.game_over
+
+
+def test_run_headless_reports_pieces_placed():
+    result = run_headless(60, seed=1, weights={f: 0.0 for f in FEATURES})
+    assert result["pieces"] == 60
+
+
+# hash_boards agrees with the engine's hash for the bot's boards and, given
+# their salts, for taller ones that extended the salt list
+@pytest.mark.parametrize("height", [GRID_H, GRID_H * 2])
+def test_hash_boards_matches_zobrist(height):
+    zobrist_salts(height)
+    rng = random.Random(height)
+    rows = [[rng.getrandbits(GRID_W) for _ in range(height)] for _ in range(8)]
+    boards = np.array(rows, dtype=np.uint32)
+    if height == GRID_H:
+        got = hash_boards(boards)
+    else:
+        got = hash_boards(boards, np.array(ZOBRIST_SALTS[:height], dtype=np.uint64))
+    assert [int(h) for h in got] == [zobrist(r) for r in rows]
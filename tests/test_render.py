@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+pytest.importorskip("pygame")
+
+from engine import COLORS, SHAPES, SPAWN_Y, Piece
+from tetris import Game
+
+FRAME_SIZE = (480, 270)
+
+
+def frame_bytes(game):
+    import pygame
+
+    return pygame.image.tobytes(game.screen, "RGB")
+
+
+# The dirty-rect frame after each lock must equal a full redraw, including on
+# boards wide enough that pieces land past column 63
+@pytest.mark.parametrize("width, height", [(10, 20), (100, 40), (200, 900)])
+def test_incremental_render_matches_full_redraw(tmp_path, width, height):
+    game = Game(
+        scores_path=os.fspath(tmp_path / "scores.json"),
+        width=width,
+        height=height,
+        offscreen=FRAME_SIZE,
+    )
+    try:
+        game.reset(0)
+        game.render()
+        kinds = list(SHAPES)
+        for i in range(40):
+            game.current = Piece(kinds[i % len(kinds)], (i * 37) % (width - 3), SPAWN_Y)
+            game.hard_drop()
+            if game.board.game_over:
+                break
+            game.render()
+            incremental = frame_bytes(game)
+            game.background = None
+            game.render()
+            assert incremental == frame_bytes(game), i
+    finally:
+        game.scores.close()
+
+
+# A fading banner or floater reuses its one render however its alpha changes
+def test_fading_text_is_rendered_once(tmp_path):
+    game = Game(scores_path=os.fspath(tmp_path / "scores.json"), offscreen=FRAME_SIZE)
+    try:
+        game.reset(0)
+        game.spawn_floater("+800", COLORS["accent"])
+        game.board.tetris_banner_timer = 1200
+        game.render()
+        cached = len(game.text_cache.entries)
+        for _ in range(10):
+            game.floaters[0]["life"] -= 90
+            game.board.tetris_banner_timer -= 90
+            game.render()
+            assert len(game.text_cache.entries) == cached
+    finally:
+        game.scores.close()
@@ -0,0 +1,27 @@
+import pytest
+
+from engine import ACTION_HARD_DROP, ACTION_LEFT, Engine
+from replay import Replay, verify
+
+
+def recorded_game(seed):
+    engine = Engine(seed, record=True)
+    for i in range(30):
+        engine.step(ACTION_LEFT if i % 3 else ACTION_HARD_DROP)
+        engine.tick(16)
+    return Replay.from_engine(engine)
+
+
+@pytest.mark.parametrize("seed", [0, 12345, -1, -(2**40)])
+def test_replay_round_trips_its_seed(seed):
+    replay = Replay.decode(recorded_game(seed).encode())
+    assert replay.recording.seed == seed
+    assert verify(replay)[0]
+
+
+# Tick lengths are whole milliseconds; anything else is refused, not mangled
+def test_replay_refuses_a_fractional_dt():
+    replay = recorded_game(1)
+    replay.recording.dts[3] = 16.5
+    with pytest.raises(TypeError):
+        replay.encode()
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from scores import JsonScoreStore, ScoreStore, SqliteScoreStore, load_json_scores
+
+
+def run(score):
+    return {"time": "2024-01-01 12:00", "score": score, "level": 1}
+
+
+def test_score_store_is_abstract():
+    with pytest.raises(TypeError):
+        ScoreStore()
+
+
+# A failing save is reported and dropped; flush() and close() still return
+def test_writer_survives_a_failing_save(tmp_path, capsys):
+    class Failing(JsonScoreStore):
+        def _write(self, entries):
+            raise ValueError("boom")
+
+    store = Failing(str(tmp_path / "s.json"))
+    store.add(run(10))
+    store.flush()
+    store.add(run(20))
+    store.close()
+    assert "boom" in capsys.readouterr().err
+    assert store.high == 20
+
+
+def test_json_store_keeps_every_run(tmp_path):
+    path = str(tmp_path / "s.json")
+    store = JsonScoreStore(path)
+    for score in range(6000):
+        store.add(run(score))
+    store.close()
+    reopened = JsonScoreStore(path)
+    reopened.close()
+    assert len(reopened.history) == 6000
+    assert reopened.high == 5999
+    assert reopened.percentile_rank(2999) == 50.0
+
+
+# The older single-document file is converted once, keeping its mode, and later
+# saves only append
+def test_json_store_converts_a_legacy_file(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text(json.dumps({"high": 900, "history": [run(s) for s in range(10)]}))
+    path.chmod(0o640)
+    store = JsonScoreStore(str(path))
+    converted = path.read_text()
+    store.add(run(10))
+    store.close()
+    assert (path.stat().st_mode & 0o777) == 0o640
+    assert path.read_text().startswith(converted)
+    high, history, legacy = load_json_scores(str(path))
+    assert (high, len(history), legacy) == (900, 11, False)
+    assert store.high == 900
+    assert [e["score"] for e in store.top(2)] == [10, 9]
+
+
+def test_json_store_skips_a_torn_line(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text(json.dumps(run(1)) + "\n" + json.dumps(run(2))[:-5])
+    store = JsonScoreStore(str(path))
+    store.add(run(3))
+    store.close()
+    _, history, _ = load_json_scores(str(path))
+    assert [e["score"] for e in history] == [1, 3]
+
+
+def test_sqlite_store_keeps_every_run(tmp_path):
+    store = SqliteScoreStore(str(tmp_path / "s.db"))
+    for score in range(20):
+        store.add(run(score))
+    assert store.percentile_rank(9) == 50.0
+    assert store.daily()[0]["games"] == 20
+    store.close()
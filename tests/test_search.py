@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from engine import Engine
+from search import PLAN_BUDGET_MS, BeamPlanner
+
+LIVE_PIECES = 300
+FRAME_MS = 16
+# Headroom over the budget for one expansion past the deadline and a noisy
+# machine, still well short of the full-collection stalls a large cache caused
+WORST_PLAN_MS = PLAN_BUDGET_MS + 40
+
+
+# Pieces fed as the game does, one action per frame, so the caches fill and the
+# collector runs as in live --beam play
+def test_worst_plan_time_at_live_speed():
+    planner = BeamPlanner()
+    engine = Engine(3)
+    worst = 0.0
+    while engine.pieces < LIVE_PIECES:
+        if engine.board.game_over:
+            engine.reset(engine.seed + 1)
+        start = time.perf_counter()
+        actions = planner.plan(engine)
+        worst = max(worst, (time.perf_counter() - start) * 1000)
+        pieces = engine.pieces
+        for action in actions:
+            engine.step(action)
+            engine.tick(FRAME_MS)
+            if engine.pieces != pieces:
+                break
+        while engine.pieces == pieces and not engine.board.game_over:
+            engine.tick(FRAME_MS)
+    assert worst < WORST_PLAN_MS
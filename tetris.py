@@ -1,312 +1,339 @@
+import time
+
+STARTED = time.perf_counter()
+
 import sys
 import os
 import json
-import random
-import pygame
+import argparse
+import subprocess
+import statistics
 from datetime import datetime
+from collections import OrderedDict
+from itertools import groupby
+
+from engine import (
+    COLORS,
+    GRID_H,
+    GRID_W,
+    MIN_BOARD_SIZE,
+    SHAPES,
+    VISIBLE_NEXT,
+    ACTION_HARD_DROP,
+    ACTION_HOLD,
+    ACTION_LEFT,
+    ACTION_RIGHT,
+    ACTION_ROTATE_CCW,
+    ACTION_ROTATE_CW,
+    ACTION_SOFT_DROP,
+    Engine,
+)
+from profiler import EXPORT_FORMATS, FrameProfiler
+from replay import REPLAY_EXT, Replay
+from scores import SCORE_FILE, open_store
 
 # ----------------------- Settings -----------------------
-GRID_W, GRID_H = 10, 20
-VISIBLE_NEXT = 3
-LINES_PER_LEVEL = 10
-INITIAL_FALL_MS = 800
-LEVEL_SPEEDUP_MS = 60
-MIN_FALL_MS = 70
-FPS = 60
+FPS = 60  # render rate cap; 0 renders as fast as possible
+SIM_TICK_MS = 10  # gravity and timers advance in fixed steps of this size
+MAX_CATCHUP_TICKS = 10  # at most this much backlog is simulated per frame
+IDLE_WAIT_MS = 250  # paused or game over: redraw at most this often
 FONT_NAME = "consolas"
-SCORE_FILE = "tetris_scores.json"
-MAX_SAVED_SCORES = 20
+
+
+# Per-user cache directory: XDG_CACHE_HOME (or ~/.cache), ~/Library/Caches on
+# macOS, LOCALAPPDATA on Windows
+def user_cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "tetris")
+
+
+FONT_CACHE_FILE = os.path.join(user_cache_dir(), "fonts.json")
 
 SAFE_MARGIN_RATIO = 0.04
 MIN_BLOCK = 14
 MAX_BLOCK = 52
+MIN_SPRITE_CELL = 4  # smaller cells are drawn as a scaled one-pixel-per-cell image
 
 TITLE_TOP_PAD_RATIO = 0.015
 TITLE_MIN_SCALE = 0.65
 
-# Colors
-COLORS = {
-    "I": (0, 240, 240),
-    "J": (0, 0, 240),
-    "L": (240, 160, 0),
-    "O": (240, 240, 0),
-    "S": (0, 240, 0),
-    "T": (160, 0, 240),
-    "Z": (240, 0, 0),
-    "ghost": (150, 150, 155),
-    "bg": (12, 14, 20),
-    "panel": (20, 24, 32),
-    "frame": (85, 100, 130),
-    "grid": (45, 55, 70),
-    "text": (230, 235, 240),
-    "subtext": (160, 170, 185),
-    "accent": (255, 205, 90),
-    "ok": (110, 220, 160),
-    "danger": (255, 115, 115),
-    "button_bg": (45, 55, 75),
-    "button_hover": (70, 90, 120),
-    "button_text": (240, 245, 250),
-}
-
-# Shapes (rotations)
-SHAPES = {
-    "I": [
-        [(0, 1), (1, 1), (2, 1), (3, 1)],
-        [(2, 0), (2, 1), (2, 2), (2, 3)],
-        [(0, 2), (1, 2), (2, 2), (3, 2)],
-        [(1, 0), (1, 1), (1, 2), (1, 3)],
-    ],
-    "J": [
-        [(0, 0), (0, 1), (1, 1), (2, 1)],
-        [(1, 0), (2, 0), (1, 1), (1, 2)],
-        [(0, 1), (1, 1), (2, 1), (2, 2)],
-        [(1, 0), (1, 1), (0, 2), (1, 2)],
-    ],
-    "L": [
-        [(2, 0), (0, 1), (1, 1), (2, 1)],
-        [(1, 0), (1, 1), (1, 2), (2, 2)],
-        [(0, 1), (1, 1), (2, 1), (0, 2)],
-        [(0, 0), (1, 0), (1, 1), (1, 2)],
-    ],
-    "O": [[(1, 0), (2, 0), (1, 1), (2, 1)]] * 4,
-    "S": [
-        [(1, 0), (2, 0), (0, 1), (1, 1)],
-        [(1, 0), (1, 1), (2, 1), (2, 2)],
-        [(1, 1), (2, 1), (0, 2), (1, 2)],
-        [(0, 0), (0, 1), (1, 1), (1, 2)],
-    ],
-    "T": [
-        [(1, 0), (0, 1), (1, 1), (2, 1)],
-        [(1, 0), (1, 1), (2, 1), (1, 2)],
-        [(0, 1), (1, 1), (2, 1), (1, 2)],
-        [(1, 0), (0, 1), (1, 1), (1, 2)],
-    ],
-    "Z": [
-        [(0, 0), (1, 0), (1, 1), (2, 1)],
-        [(2, 0), (1, 1), (2, 1), (1, 2)],
-        [(0, 1), (1, 1), (1, 2), (2, 2)],
-        [(1, 0), (0, 1), (1, 1), (0, 2)],
-    ],
-}
-
-
-# SRS kicks
-def build_srs_kicks():
-    kicks_jlstz = {
-        (0, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-        (1, 0): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
-        (1, 2): [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],
-        (2, 1): [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],
-        (2, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
-        (3, 2): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
-        (3, 0): [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)],
-        (0, 3): [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],
-    }
-    kicks_i = {
-        (0, 1): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
-        (1, 0): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
-        (1, 2): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
-        (2, 1): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
-        (2, 3): [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],
-        (3, 2): [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],
-        (3, 0): [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)],
-        (0, 3): [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],
-    }
-    return kicks_jlstz, kicks_i
+TEXT_CACHE_SIZE = 128
 
+PROFILE_REFRESH_MS = 250
+PROFILE_PHASES = ("frame", "interval", "events", "bot", "simulate", "render", "play")
 
-KICKS_JLSTZ, KICKS_I = build_srs_kicks()
+GHOST_ALPHA = 110
+NEXT_SCALE = 0.55
+HOLD_SCALE = 0.6
 
+# pygame is imported by the first Game, so headless entry points (the startup
+# benchmark's parent) never load SDL
+pygame = None
+KEY_ACTIONS = {}
+PROFILE_KEY = None
 
-def new_bag():
-    bag = list(SHAPES.keys())
-    random.shuffle(bag)
-    return bag
+
+def import_pygame():
+    global pygame, PROFILE_KEY
+    if pygame is None:
+        import pygame as pg
+
+        pygame = pg
+        PROFILE_KEY = pg.K_F3
+        KEY_ACTIONS.update(
+            {
+                pg.K_LEFT: ACTION_LEFT,
+                pg.K_RIGHT: ACTION_RIGHT,
+                pg.K_DOWN: ACTION_SOFT_DROP,
+                pg.K_UP: ACTION_ROTATE_CW,
+                pg.K_x: ACTION_ROTATE_CW,
+                pg.K_z: ACTION_ROTATE_CCW,
+                pg.K_SPACE: ACTION_HARD_DROP,
+                pg.K_c: ACTION_HOLD,
+            }
+        )
+    return pygame
 
 
 def clamp(v, lo, hi):
     return max(lo, min(hi, v))
 
 
-# ----------------------- Scoreboard persistence -----------------------
-def load_scores():
-    if not os.path.exists(SCORE_FILE):
-        return {"high": 0, "history": []}
+# ----------------------- Fonts -----------------------
+# SysFont scans every installed font on first use, which is slow on machines
+# with many fonts. The file it would pick (None for pygame's default font) and
+# whether bold has to be synthesized are cached on disk per (name, bold).
+_font_paths = None
+
+
+def resolve_font(name, bold=False):
+    global _font_paths
+    if _font_paths is None:
+        try:
+            with open(FONT_CACHE_FILE, "r", encoding="utf-8") as f:
+                _font_paths = json.load(f)
+        except (OSError, ValueError):
+            _font_paths = {}
+    key = f"{name}|{'bold' if bold else 'regular'}"
+    found = _font_paths.get(key)
+    if found is not None and (found[0] is None or os.path.exists(found[0])):
+        return found
+    path = pygame.font.match_font(name, bold=bold)
+    fake_bold = bold and (path is None or path == pygame.font.match_font(name))
+    found = _font_paths[key] = [path, fake_bold]
     try:
-        with open(SCORE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if "high" not in data or "history" not in data:
-                return {"high": 0, "history": []}
-            return data
-    except Exception:
-        return {"high": 0, "history": []}
+        os.makedirs(os.path.dirname(FONT_CACHE_FILE), exist_ok=True)
+        with open(FONT_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(_font_paths, f)
+    except OSError:
+        pass
+    return found
 
 
-def save_scores(data):
-    try:
-        with open(SCORE_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-    except Exception:
-        pass
+def make_font(name, size, bold=False):
+    path, fake_bold = resolve_font(name, bold)
+    font = pygame.font.Font(path, size)
+    if fake_bold:
+        font.set_bold(True)
+    return font
 
 
-# ----------------------- Core classes -----------------------
-class Piece:
-    def __init__(self, kind, x, y):
-        self.kind = kind
-        self.rot = 0
-        self.x = x
-        self.y = y
-
-    def blocks(self, ox=0, oy=0, rot=None):
-        r = self.rot if rot is None else rot
-        for cx, cy in SHAPES[self.kind][r]:
-            yield self.x + cx + ox, self.y + cy + oy
-
-    def clone(self):
-        p = Piece(self.kind, self.x, self.y)
-        p.rot = self.rot
-        return p
-
-
-class Board:
-    def __init__(self):
-        self.grid = [[None for _ in range(GRID_W)] for _ in range(GRID_H)]
-        self.score = 0
-        self.lines = 0
-        self.level = 0
-        self.game_over = False
-        self.tetris_banner_timer = 0
-        self.last_clear_rows = 0
-
-    def inside(self, x, y):
-        return 0 <= x < GRID_W and y < GRID_H
-
-    def collides(self, piece):
-        for x, y in piece.blocks():
-            if y < 0:
-                continue
-            if not self.inside(x, y) or (y >= 0 and self.grid[y][x] is not None):
-                return True
-        return False
-
-    def lock_piece(self, piece):
-        for x, y in piece.blocks():
-            if y < 0:
-                self.game_over = True
-                return []
-            self.grid[y][x] = COLORS[piece.kind]
-        cleared = self.clear_lines()
-        self.update_score_and_level(len(cleared))
-        self.last_clear_rows = len(cleared)
-        if self.last_clear_rows == 4:
-            self.tetris_banner_timer = 1200
-        return cleared
-
-    def clear_lines(self):
-        full = [
-            r
-            for r in range(GRID_H)
-            if all(self.grid[r][c] is not None for c in range(GRID_W))
-        ]
-        for r in full:
-            del self.grid[r]
-            self.grid.insert(0, [None for _ in range(GRID_W)])
-        return full
+# Rendered text, the least recently used dropped past `capacity` entries
+class TextCache:
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
 
-    def update_score_and_level(self, nrows):
-        if nrows == 0:
-            return
-        add = {1: 100, 2: 300, 3: 500, 4: 800}.get(nrows, 0)
-        self.score += add * (self.level + 1)
-        self.lines += nrows
-        new_level = self.lines // LINES_PER_LEVEL
-        if new_level > self.level:
-            self.level = new_level
+    def get(self, key):
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+        return surf
+
+    def put(self, key, surf):
+        self.entries[key] = surf
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
 
 
 # ----------------------- Game -----------------------
-class Game:
-    def __init__(self):
+class Game(Engine):
+    def __init__(
+        self,
+        bot=None,
+        bot_speed=0,
+        profile_path=None,
+        profile_format=None,
+        record_dir=None,
+        scores_path=SCORE_FILE,
+        fps=FPS,
+        vsync=False,
+        width=GRID_W,
+        height=GRID_H,
+        offscreen=None,
+    ):
+        # Headless: render() draws into an offscreen (w, h) surface and never
+        # presents it. SDL defaults to the dummy video driver, so no window
+        # system is needed; the hidden 1x1 window only gives convert_alpha() a
+        # pixel format.
+        self.offscreen = offscreen
+        if offscreen:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import_pygame()
         pygame.init()
         pygame.display.set_caption("Tetris (Fullscreen Safe)")
         self.clock = pygame.time.Clock()
 
-        # Fullscreen
-        self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        info = pygame.display.Info()
-        self.SW, self.SH = info.current_w, info.current_h
-
+        # Fullscreen; with vsync the display flip paces the renderer
+        self.fps = fps
+        self.vsync = vsync
+        self.screen = None
+        if offscreen:
+            self.vsync = False
+            pygame.display.set_mode((1, 1), pygame.HIDDEN)
+            self.screen = pygame.Surface(offscreen)
+        elif vsync:
+            desktop = pygame.display.Info()
+            try:
+                self.screen = pygame.display.set_mode(
+                    (desktop.current_w, desktop.current_h),
+                    pygame.FULLSCREEN | pygame.SCALED,
+                    vsync=1,
+                )
+            except pygame.error:
+                self.vsync = False
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        if offscreen:
+            self.SW, self.SH = offscreen
+        else:
+            info = pygame.display.Info()
+            self.SW, self.SH = info.current_w, info.current_h
+
+        # Every game's inputs are recorded and saved here when it ends
+        self.record_dir = record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+        super().__init__(record=bool(record_dir), width=width, height=height)
+
+        # Rendered text keyed by (font, text, color); fonts are rebuilt with
+        # the layout, so the cache is cleared along with them
+        self.text_cache = TextCache()
         self.compute_layout_and_fonts()
-
-        self.reset()
-        self.scores = load_scores()
-        self.buttons = {}
-        self.build_buttons()
-
+        # Runs are saved on a background thread (JSON by default, SQLite for .db)
+        self.scores = open_store(scores_path)
+        self.scores_rev = 0
+
+        # Autoplay: bot_speed is actions per frame, 0 places a whole piece per frame
+        self.bot = bot
+        self.bot_speed = bot_speed
+        self.bot_actions = []
+        self.bot_piece = None
+
+        # Frame timing; the overlay is toggled with PROFILE_KEY and the trace is
+        # written to profile_path on exit
+        self.profiler = FrameProfiler()
+        self.profile_path = profile_path
+        self.profile_format = profile_format
+        self.show_profile = False
+        self.profile_surface = None
+        self.profile_rev = 0
+        self.profile_refreshed = -PROFILE_REFRESH_MS
+
+    # The largest block that fits the width, then the height with a full-size
+    # title; only at MIN_BLOCK does the title shrink, in 5% steps down to
+    # TITLE_MIN_SCALE. Height is monotonic in both, so each is a binary search
+    # and only the title heights it probes need fonts before the final build.
+    # Panels and text are sized as for a board of at least GRID_W x GRID_H. A
+    # board that still does not fit keeps MIN_BLOCK for them and shrinks only
+    # its cells (self.cell); below MIN_SPRITE_CELL the board is drawn as one
+    # pixel per cell and scaled to the play area.
     def compute_layout_and_fonts(self):
+        rows, cols = self.height, self.width
+        fit_rows, fit_cols = max(rows, GRID_H), max(cols, GRID_W)
         self.margin = int(self.SH * SAFE_MARGIN_RATIO)
         usable_h = self.SH - 2 * self.margin
-        block = clamp(usable_h // GRID_H, MIN_BLOCK, MAX_BLOCK)
-
-        def layout_for(block_size, title_scale_guess=1.0):
-            base = clamp(block_size, 16, 32)
-            font_big = pygame.font.SysFont(FONT_NAME, int(base * 1.6), bold=True)
-            font_huge = pygame.font.SysFont(
-                FONT_NAME, int(base * 2.2 * title_scale_guess), bold=True
+        panel_w = clamp(int(self.SW * 0.16), 180, 340)
+        title_top_pad = int(self.SH * TITLE_TOP_PAD_RATIO)
+        title_heights = {}
+
+        def title_size(block_size, title_scale):
+            return int(clamp(block_size, 16, 32) * 2.2 * title_scale)
+
+        def height_needed(block_size, title_scale):
+            size = title_size(block_size, title_scale)
+            if size not in title_heights:
+                title_heights[size] = make_font(FONT_NAME, size, bold=True).get_height()
+            return (
+                self.margin
+                + title_heights[size]
+                + title_top_pad
+                + block_size * fit_rows
+                + self.margin
             )
 
-            play_w_px = block_size * GRID_W
-            play_h_px = block_size * GRID_H
-            panel_w = clamp(int(self.SW * 0.16), 180, 340)
-            total_w = panel_w * 2 + play_w_px + self.margin * 2
-
-            title_surface = font_huge.render("TETRIS", True, COLORS["accent"])
-            title_h = title_surface.get_height()
-            title_top_pad = int(self.SH * TITLE_TOP_PAD_RATIO)
-
-            play_top = self.margin + title_h + title_top_pad
-            total_height_needed = play_top + play_h_px + self.margin
-
-            return {
-                "block": block_size,
-                "play_w_px": play_w_px,
-                "play_h_px": play_h_px,
-                "panel_w": panel_w,
-                "total_w": total_w,
-                "title_surface": title_surface,
-                "title_h": title_h,
-                "play_top": play_top,
-                "total_height_needed": total_height_needed,
-                "font_base": base,
-                "font_big": font_big,
-                "font_huge": font_huge,
-            }
-
-        title_scale = 1.0
-        L = layout_for(block, title_scale)
-
-        def fits(L):
-            return L["total_w"] <= self.SW and L["total_height_needed"] <= self.SH
-
-        while L["total_w"] > self.SW and block > MIN_BLOCK:
-            block -= 1
-            L = layout_for(block, title_scale)
-        while L["total_height_needed"] > self.SH and block > MIN_BLOCK:
-            block -= 1
-            L = layout_for(block, title_scale)
-        while L["total_height_needed"] > self.SH and title_scale > TITLE_MIN_SCALE:
-            title_scale *= 0.95
-            L = layout_for(block, title_scale)
-        while not fits(L) and block > MIN_BLOCK:
-            block -= 1
-            L = layout_for(block, max(title_scale, TITLE_MIN_SCALE))
-
-        self.block = L["block"]
-        self.play_w_px = L["play_w_px"]
-        self.play_h_px = L["play_h_px"]
-        self.panel_w = L["panel_w"]
-        self.title_surface = L["title_surface"]
+        block = clamp(usable_h // fit_rows, MIN_BLOCK, MAX_BLOCK)
+        fit_w = (self.SW - panel_w * 2 - self.margin * 2) // fit_cols
+        lo, hi = MIN_BLOCK, max(MIN_BLOCK, min(block, fit_w))
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if height_needed(mid, 1.0) <= self.SH:
+                lo = mid
+            else:
+                hi = mid - 1
+        block = lo
+
+        scales = [1.0]
+        while scales[-1] > TITLE_MIN_SCALE:
+            scales.append(scales[-1] * 0.95)
+        lo, hi = 0, len(scales) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if height_needed(block, scales[mid]) <= self.SH:
+                hi = mid
+            else:
+                lo = mid + 1
+        title_scale = scales[lo]
+
+        self.cell = block
+        self.cell_scale = float(block)
+        self.pixel_mode = False
+        self.play_w_px = block * cols
+        self.play_h_px = block * rows
+        self.panel_h = block * fit_rows
+        if height_needed(block, title_scale) > self.SH or block > fit_w:
+            title_h = title_heights[title_size(block, title_scale)]
+            avail_w = self.SW - panel_w * 2 - self.margin * 4
+            avail_h = usable_h - title_h - title_top_pad
+            scale = max(min(avail_w / cols, avail_h / rows), 1 / max(cols, rows))
+            self.cell = int(scale)
+            self.pixel_mode = self.cell < MIN_SPRITE_CELL
+            if self.pixel_mode:
+                self.cell_scale = scale
+                self.play_w_px = max(1, int(cols * scale))
+                self.play_h_px = max(1, int(rows * scale))
+            else:
+                self.cell_scale = float(self.cell)
+                self.play_w_px = self.cell * cols
+                self.play_h_px = self.cell * rows
+            self.panel_h = max(self.play_h_px, avail_h)
+
+        base = clamp(block, 16, 32)
+        self.block = block
+        self.panel_w = panel_w
+        self.font = make_font(FONT_NAME, base)
+        self.font_small = make_font(FONT_NAME, int(base * 0.7))
+        self.font_big = make_font(FONT_NAME, int(base * 1.6), bold=True)
+        self.font_huge = make_font(FONT_NAME, title_size(block, title_scale), bold=True)
+        self.title_surface = self.font_huge.render("TETRIS", True, COLORS["accent"])
 
         total_w = self.panel_w * 2 + self.play_w_px + self.margin * 2
         extra_x = max(0, (self.SW - total_w) // 2)
@@ -314,28 +341,55 @@ class Game:
         self.play_x = self.left_panel_x + self.panel_w + self.margin
         self.right_panel_x = self.play_x + self.play_w_px + self.margin
 
-        self.top_y = L["play_top"]
+        self.top_y = self.margin + self.title_surface.get_height() + title_top_pad
         self.title_top = self.margin
 
-        self.font = pygame.font.SysFont(FONT_NAME, clamp(self.block, 16, 32))
-        self.font_small = pygame.font.SysFont(
-            FONT_NAME, int(clamp(self.block, 16, 32) * 0.7)
-        )
-        self.font_big = L["font_big"]
-        self.font_huge = L["font_huge"]
-
-    def reset(self):
-        self.board = Board()
-        self.bag = new_bag()
-        self.queue = []
-        while len(self.queue) < VISIBLE_NEXT:
-            self.refill_bag()
-        self.current = self.spawn_piece()
-        self.hold = None
-        self.hold_locked = False
-        self.drop_timer = 0
-        self.fall_ms = INITIAL_FALL_MS
-        self.paused = False
+        self.text_cache.clear()
+        self.build_sprites()
+        self.build_buttons()
+        self.background = None
+
+    # Cell sprites depend only on (color, alpha, cell size), so they are built
+    # once per layout instead of allocated per cell per frame
+    def build_sprites(self):
+        self.sprites = {}
+        self.mini_sprites = {}
+        for kind in SHAPES:
+            if not self.pixel_mode:
+                self.cell_sprite(COLORS[kind])
+            self.mini_sprite(kind, int(self.block * NEXT_SCALE))
+            self.mini_sprite(kind, int(self.block * HOLD_SCALE))
+        if not self.pixel_mode:
+            self.cell_sprite(COLORS["ghost"], GHOST_ALPHA)
+
+    def cell_sprite(self, color, alpha=255):
+        key = (color, alpha, self.cell)
+        surf = self.sprites.get(key)
+        if surf is None:
+            size = self.cell - 2
+            surf = pygame.Surface((size, size), pygame.SRCALPHA)
+            surf.fill((*color, alpha))
+            if size > 6:
+                pygame.draw.rect(surf, (255, 255, 255, 40), (0, 0, size, 3))
+                pygame.draw.rect(surf, (0, 0, 0, 50), (0, size - 3, size, 3))
+            surf = surf.convert_alpha()
+            self.sprites[key] = surf
+        return surf
+
+    def mini_sprite(self, kind, size):
+        key = (kind, size)
+        surf = self.mini_sprites.get(key)
+        if surf is None:
+            r = pygame.Rect(0, 0, size - 3, size - 3)
+            surf = pygame.Surface(r.size, pygame.SRCALPHA)
+            pygame.draw.rect(surf, COLORS[kind], r, border_radius=5)
+            pygame.draw.rect(surf, (255, 255, 255), r, width=1, border_radius=5)
+            surf = surf.convert_alpha()
+            self.mini_sprites[key] = surf
+        return surf
+
+    def reset(self, seed=None):
+        super().reset(seed)
         self.floaters = []
 
     def build_buttons(self):
@@ -343,7 +397,7 @@ class Game:
         btn_w = self.panel_w - 2 * pad
         btn_h = int(self.block * 1.3)
         spacing = int(self.block * 0.45)
-        max_bottom = self.top_y + self.play_h_px - pad
+        max_bottom = self.top_y + self.panel_h - pad
 
         y2 = max_bottom - btn_h
         y1 = y2 - spacing - btn_h
@@ -361,31 +415,20 @@ class Game:
             "exit": pygame.Rect(x, y2, btn_w, btn_h),
         }
 
-    def refill_bag(self):
-        if not self.bag:
-            self.bag = new_bag()
-        self.queue.append(self.bag.pop())
-
-    def spawn_piece(self):
-        if not self.queue:
-            self.refill_bag()
-        kind = self.queue.pop(0)
-        while len(self.queue) < VISIBLE_NEXT:
-            self.refill_bag()
-        p = Piece(kind, x=3, y=-2)
-        if self.board.collides(p):
-            self.board.game_over = True
-        return p
-
     # ---------------- Input ----------------
-    def handle_events(self):
+    def handle_events(self, events=None):
         mouse_pos = pygame.mouse.get_pos()
-        for e in pygame.event.get():
+        if events is None:
+            events = pygame.event.get()
+        for e in events:
             if e.type == pygame.QUIT:
                 self.quit_game()
             elif e.type == pygame.KEYDOWN:
                 if e.key == pygame.K_ESCAPE:
                     self.quit_game()
+                if e.key == PROFILE_KEY:
+                    self.show_profile = not self.show_profile
+                    continue
                 if self.board.game_over:
                     if e.key == pygame.K_r:
                         self.end_run_record()
@@ -397,20 +440,8 @@ class Game:
                     continue
                 if self.paused:
                     continue
-                if e.key == pygame.K_LEFT:
-                    self.try_move(-1, 0)
-                elif e.key == pygame.K_RIGHT:
-                    self.try_move(1, 0)
-                elif e.key == pygame.K_DOWN:
-                    self.soft_drop()
-                elif e.key in (pygame.K_UP, pygame.K_x):
-                    self.rotate(+1)
-                elif e.key == pygame.K_z:
-                    self.rotate(-1)
-                elif e.key == pygame.K_SPACE:
-                    self.hard_drop()
-                elif e.key == pygame.K_c:
-                    self.hold_piece()
+                if e.key in KEY_ACTIONS:
+                    self.step(KEY_ACTIONS[e.key])
 
             elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
                 if self.buttons["restart"].collidepoint(mouse_pos):
@@ -420,79 +451,38 @@ class Game:
                 elif self.buttons["exit"].collidepoint(mouse_pos):
                     self.quit_game()
 
-    def try_move(self, dx, dy):
-        t = self.current.clone()
-        t.x += dx
-        t.y += dy
-        if not self.board.collides(t):
-            self.current = t
-
-    def rotate(self, direction):
-        p = self.current
-        r_from = p.rot
-        r_to = (p.rot + direction) % 4
-        kicks = KICKS_I if p.kind == "I" else KICKS_JLSTZ
-        for dx, dy in kicks.get((r_from, r_to), [(0, 0)]):
-            t = p.clone()
-            t.rot = r_to
-            t.x += dx
-            t.y += dy
-            if not self.board.collides(t):
-                self.current = t
-                return
-
-    def soft_drop(self):
-        self.try_move(0, 1)
-
-    def hard_drop(self):
-        dist = 0
-        t = self.current.clone()
-        while not self.board.collides(t):
-            t.y += 1
-            dist += 1
-        dist -= 1
-        if dist > 0:
-            self.current.y += dist
-        self.lock_current()
-
-    def lock_current(self):
-        self.board.lock_piece(self.current)
-        if self.board.last_clear_rows > 0:
+    # Engine hooks
+    def on_lock(self, nrows):
+        if nrows > 0:
             text = {1: "+100", 2: "DOUBLE! +300", 3: "TRIPLE! +500", 4: "TETRIS! +800"}[
-                self.board.last_clear_rows
+                nrows
             ]
             self.spawn_floater(
                 text,
-                color=(
-                    COLORS["ok"] if self.board.last_clear_rows < 4 else COLORS["accent"]
-                ),
+                color=(COLORS["ok"] if nrows < 4 else COLORS["accent"]),
             )
-        self.update_speed()
-        self.hold_locked = False
-        if not self.board.game_over:
-            self.current = self.spawn_piece()
-        else:
-            self.end_run_record()
 
-    def update_speed(self):
-        self.fall_ms = max(
-            MIN_FALL_MS, INITIAL_FALL_MS - self.board.level * LEVEL_SPEEDUP_MS
-        )
+    def on_game_over(self):
+        self.end_run_record()
 
-    def hold_piece(self):
-        if self.hold_locked:
+    # Autoplay
+    def update_bot(self):
+        if self.bot is None or self.paused:
             return
-        if self.hold is None:
-            self.hold = self.current.kind
-            self.current = self.spawn_piece()
-        else:
-            self.hold, self.current.kind = self.current.kind, self.hold
-            self.current.rot = 0
-            self.current.x, self.current.y = 3, -2
-            if self.board.collides(self.current):
-                self.board.game_over = True
-                self.end_run_record()
-        self.hold_locked = True
+        if self.board.game_over:
+            self.reset()
+            self.build_buttons()
+            return
+        if self.bot_piece != self.pieces:
+            self.bot_piece = self.pieces
+            self.bot_actions = self.bot.plan(self)
+        if not self.bot_actions:
+            # No placement was found, or the plan only held: drop the piece
+            self.bot_actions = [ACTION_HARD_DROP]
+        n = self.bot_speed or len(self.bot_actions)
+        while n > 0 and self.bot_actions and self.bot_piece == self.pieces:
+            self.step(self.bot_actions.pop(0))
+            n -= 1
 
     # Floaters
     def spawn_floater(self, text, color):
@@ -516,54 +506,40 @@ class Game:
             if f["life"] - dt > 0
         ]
 
-    # Gravity
-    def tick_gravity(self, dt):
-        if self.board.game_over or self.paused:
-            return
-        self.drop_timer += dt
-        while self.drop_timer >= self.fall_ms:
-            self.drop_timer -= self.fall_ms
-            t = self.current.clone()
-            t.y += 1
-            if self.board.collides(t):
-                self.lock_current()
-                break
-            else:
-                self.current = t
-
-        if self.board.tetris_banner_timer > 0:
-            self.board.tetris_banner_timer = max(0, self.board.tetris_banner_timer - dt)
-
     # ---------------- Rendering helpers ----------------
     def draw_panel(self, rect):
         pygame.draw.rect(self.screen, COLORS["panel"], rect, border_radius=12)
         pygame.draw.rect(self.screen, COLORS["frame"], rect, width=2, border_radius=12)
 
     def draw_cell(self, gx, gy, color, alpha=255):
-        x = self.play_x + gx * self.block
-        y = self.top_y + gy * self.block
-        r = pygame.Rect(x + 1, y + 1, self.block - 2, self.block - 2)
-        surf = pygame.Surface((r.width, r.height), pygame.SRCALPHA)
-        surf.fill((*color, alpha))
-        pygame.draw.rect(surf, (255, 255, 255, 40), (0, 0, r.width, 3))
-        pygame.draw.rect(surf, (0, 0, 0, 50), (0, r.height - 3, r.width, 3))
-        self.screen.blit(surf, (r.x, r.y))
+        if self.pixel_mode:
+            s = self.cell_scale
+            x, y = int(gx * s), int(gy * s)
+            w = max(1, int((gx + 1) * s) - x)
+            h = max(1, int((gy + 1) * s) - y)
+            self.screen.fill(color, (self.play_x + x, self.top_y + y, w, h))
+            return
+        x = self.play_x + gx * self.cell
+        y = self.top_y + gy * self.cell
+        self.screen.blit(self.cell_sprite(color, alpha), (x + 1, y + 1))
 
     def draw_grid(self):
         frame = pygame.Rect(
             self.play_x - 3, self.top_y - 3, self.play_w_px + 6, self.play_h_px + 6
         )
         pygame.draw.rect(self.screen, COLORS["frame"], frame, width=3, border_radius=10)
-        for x in range(GRID_W + 1):
-            px = self.play_x + x * self.block
+        if self.pixel_mode:
+            return
+        for x in range(self.width + 1):
+            px = self.play_x + x * self.cell
             pygame.draw.line(
                 self.screen,
                 COLORS["grid"],
                 (px, self.top_y),
                 (px, self.top_y + self.play_h_px),
             )
-        for y in range(GRID_H + 1):
-            py = self.top_y + y * self.block
+        for y in range(self.height + 1):
+            py = self.top_y + y * self.cell
             pygame.draw.line(
                 self.screen,
                 COLORS["grid"],
@@ -571,64 +547,102 @@ class Game:
                 (self.play_x + self.play_w_px, py),
             )
 
+    # Locked cells are drawn into a copy of the play area whenever the board
+    # changes, so a frame costs one blit however large the board is
     def draw_board(self):
-        for y in range(GRID_H):
-            for x in range(GRID_W):
-                c = self.board.grid[y][x]
+        if self.board_layer_key != self.board.hash:
+            self.board_layer_key = self.board.hash
+            self.build_board_layer()
+        self.screen.blit(self.board_layer, (self.play_x, self.top_y))
+
+    def build_board_layer(self):
+        board = self.board
+        play = pygame.Rect(self.play_x, self.top_y, self.play_w_px, self.play_h_px)
+        if self.pixel_mode:
+            pixels = pygame.Surface((board.width, board.height))
+            pixels.fill(COLORS["bg"])
+            for y in range(board.stack_top(), board.height):
+                x = 0
+                for c, run in groupby(board.grid[y]):
+                    n = len(list(run))
+                    if c is not None:
+                        pixels.fill(c, (x, y, n, 1))
+                    x += n
+            if play.w < board.width or play.h < board.height:
+                self.board_layer = pygame.transform.smoothscale(pixels, play.size)
+            else:
+                self.board_layer = pygame.transform.scale(pixels, play.size)
+            return
+        layer = self.background.subsurface(play).copy()
+        cell = self.cell
+        blits = []
+        for y in range(board.stack_top(), board.height):
+            py = y * cell + 1
+            for x, c in enumerate(board.grid[y]):
                 if c is not None:
-                    self.draw_cell(x, y, c)
+                    blits.append((self.cell_sprite(c), (x * cell + 1, py)))
+        layer.blits(blits, doreturn=False)
+        self.board_layer = layer
 
-    def draw_piece(self, piece, ghost=False):
+    def draw_piece(self, piece, ghost=False, oy=0):
         color = COLORS["ghost"] if ghost else COLORS[piece.kind]
-        alpha = 110 if ghost else 255
-        for x, y in piece.blocks():
+        alpha = GHOST_ALPHA if ghost else 255
+        for x, y in piece.blocks(0, oy):
             if y >= 0:
                 self.draw_cell(x, y, color, alpha)
 
+    # The current piece drawn where it would land
     def draw_ghost(self):
-        g = self.current.clone()
-        while not self.board.collides(g):
-            g.y += 1
-        g.y -= 1
-        if g.y >= self.current.y:
-            self.draw_piece(g, ghost=True)
+        c = self.current
+        if self.board.collides(c):
+            return
+        self.draw_piece(c, ghost=True, oy=self.board.drop_distance(c))
+
+    def text_surface(self, font, text, color):
+        key = (font, text, color)
+        surf = self.text_cache.get(key)
+        if surf is None:
+            surf = font.render(text, True, color)
+            self.text_cache.put(key, surf)
+        return surf
+
+    # Fading text shares the opaque render; its alpha applies to this blit only
+    def blit_faded(self, surf, pos, alpha):
+        surf.set_alpha(alpha)
+        self.screen.blit(surf, pos)
+        surf.set_alpha(None)
 
     def blit_label(self, text, x, y, color):
-        surf = self.font_small.render(text, True, color)
-        self.screen.blit(surf, (x, y))
+        self.screen.blit(self.text_surface(self.font_small, text, color), (x, y))
 
     def blit_value(self, text, x, y, color=COLORS["text"]):
-        surf = self.font_big.render(text, True, color)
-        self.screen.blit(surf, (x, y))
+        self.screen.blit(self.text_surface(self.font_big, text, color), (x, y))
 
     def blit_text(self, text, x, y, color=COLORS["text"]):
-        surf = self.font_small.render(text, True, color)
-        self.screen.blit(surf, (x, y))
+        self.screen.blit(self.text_surface(self.font_small, text, color), (x, y))
+
+    def draw_value(self, name):
+        rect = self.value_rects[name]
+        self.blit_value(str(getattr(self.board, name)), rect.x, rect.y)
 
     def draw_title(self):
         self.screen.blit(self.title_surface, (self.left_panel_x, self.title_top))
 
     def draw_left_panel(self):
-        rect = pygame.Rect(self.left_panel_x, self.top_y, self.panel_w, self.play_h_px)
+        rect = pygame.Rect(self.left_panel_x, self.top_y, self.panel_w, self.panel_h)
         self.draw_panel(rect)
         pad = int(self.block * 0.6)
         x = rect.x + pad
         y = rect.y + pad
 
-        self.blit_label("SCORE", x, y, COLORS["subtext"])
-        y += int(self.block * 0.8)
-        self.blit_value(str(self.board.score), x, y)
-        y += int(self.block * 1.2)
-
-        self.blit_label("LEVEL", x, y, COLORS["subtext"])
-        y += int(self.block * 0.8)
-        self.blit_value(str(self.board.level), x, y)
-        y += int(self.block * 1.2)
-
-        self.blit_label("LINES", x, y, COLORS["subtext"])
-        y += int(self.block * 0.8)
-        self.blit_value(str(self.board.lines), x, y)
-        y += int(self.block * 1.3)
+        value_w = rect.right - pad - x
+        value_h = self.font_big.get_height()
+        self.value_rects = {}
+        for name in ("score", "level", "lines"):
+            self.blit_label(name.upper(), x, y, COLORS["subtext"])
+            y += int(self.block * 0.8)
+            self.value_rects[name] = pygame.Rect(x, y, value_w, value_h)
+            y += int(self.block * (1.3 if name == "lines" else 1.2))
 
         self.blit_label("CONTROLS", x, y, COLORS["subtext"])
         y += int(self.block * 0.8)
@@ -649,10 +663,10 @@ class Game:
         y += int(self.block * 0.6)
         self.blit_label("HOLD", x, y, COLORS["subtext"])
         y += int(self.block * 0.6)
-        self.draw_mini_box(x, y, kind=self.hold)
+        self.hold_rect = self.draw_mini_box(x, y)
 
     def draw_right_panel(self):
-        rect = pygame.Rect(self.right_panel_x, self.top_y, self.panel_w, self.play_h_px)
+        rect = pygame.Rect(self.right_panel_x, self.top_y, self.panel_w, self.panel_h)
         self.draw_panel(rect)
         pad = int(self.block * 0.6)
         x = rect.x + pad
@@ -668,11 +682,11 @@ class Game:
         btn_h = int(self.block * 1.3)
         spacing = int(self.block * 0.45)
         buttons_reserved = pad + (btn_h * 2 + spacing) + pad
-        sb_h_target = int(self.play_h_px * 0.28)
+        sb_h_target = int(self.panel_h * 0.28)
 
         # Compute max height available for the next box
         max_next_area_h = (
-            self.play_h_px - (next_top - self.top_y) - buttons_reserved - sb_h_target
+            self.panel_h - (next_top - self.top_y) - buttons_reserved - sb_h_target
         )
         max_next_area_h = max(max_next_area_h, int(self.block * 2.6))
 
@@ -684,22 +698,19 @@ class Game:
             slot_h = max(22, int(slot_h * scale))
             total_next_h = slot_h * VISIBLE_NEXT
 
-        self.draw_next_list(x, next_top, next_box_w, slot_h, size_scale=0.55)
+        self.draw_next_list(x, next_top, next_box_w, slot_h)
 
         # Scoreboard sits above buttons; flex height
-        sb_y = self.top_y + self.play_h_px - buttons_reserved - sb_h_target
+        sb_y = self.top_y + self.panel_h - buttons_reserved - sb_h_target
         sb_h = sb_h_target
         min_sb_h = int(self.block * 3.2)
         if sb_y < next_top + total_next_h + pad:
             sb_y = next_top + total_next_h + pad
-            sb_h = max(
-                min_sb_h, (self.top_y + self.play_h_px - buttons_reserved) - sb_y
-            )
+            sb_h = max(min_sb_h, (self.top_y + self.panel_h - buttons_reserved) - sb_y)
 
-        self.draw_scoreboard(rect.x + pad, sb_y, rect.width - 2 * pad, sb_h)
-
-        self.build_buttons()
-        self.draw_buttons()
+        self.scoreboard_rect = pygame.Rect(
+            rect.x + pad, sb_y, rect.width - 2 * pad, sb_h
+        )
 
     def draw_mini_box(self, x, y, kind=None):
         box_w = self.panel_w - int(self.block * 1.2)
@@ -711,18 +722,32 @@ class Game:
                 kind,
                 rect.x + int(self.block * 0.45),
                 rect.y + int(self.block * 0.45),
-                size_scale=0.6,
+                size_scale=HOLD_SCALE,
             )
+        return rect
 
-    def draw_next_list(self, x, y, box_w, slot_h, size_scale=0.55):
-        rect = pygame.Rect(x, y, box_w, slot_h * VISIBLE_NEXT)
-        pygame.draw.rect(self.screen, COLORS["frame"], rect, width=2, border_radius=8)
-        yy = y + int(self.block * 0.35)
-        for kind in self.queue[:VISIBLE_NEXT]:
+    def draw_hold(self):
+        if self.hold:
             self.draw_mini_piece(
-                kind, x + int(self.block * 0.45), yy, size_scale=size_scale
+                self.hold,
+                self.hold_rect.x + int(self.block * 0.45),
+                self.hold_rect.y + int(self.block * 0.45),
+                size_scale=HOLD_SCALE,
             )
-            yy += slot_h
+
+    def draw_next_list(self, x, y, box_w, slot_h):
+        self.next_rect = pygame.Rect(x, y, box_w, slot_h * VISIBLE_NEXT)
+        self.next_slot_h = slot_h
+        pygame.draw.rect(
+            self.screen, COLORS["frame"], self.next_rect, width=2, border_radius=8
+        )
+
+    def draw_next(self, size_scale=NEXT_SCALE):
+        x = self.next_rect.x + int(self.block * 0.45)
+        yy = self.next_rect.y + int(self.block * 0.35)
+        for kind in self.peek(VISIBLE_NEXT):
+            self.draw_mini_piece(kind, x, yy, size_scale=size_scale)
+            yy += self.next_slot_h
 
     def draw_mini_piece(self, kind, x, y, size_scale=0.65):
         cells = SHAPES[kind][0]
@@ -730,10 +755,9 @@ class Game:
         miny = min(cy for cx, cy in cells)
         norm = [(cx - minx, cy - miny) for cx, cy in cells]
         size = int(self.block * size_scale)
+        sprite = self.mini_sprite(kind, size)
         for cx, cy in norm:
-            r = pygame.Rect(x + cx * size, y + cy * size, size - 3, size - 3)
-            pygame.draw.rect(self.screen, COLORS[kind], r, border_radius=5)
-            pygame.draw.rect(self.screen, (255, 255, 255), r, width=1, border_radius=5)
+            self.screen.blit(sprite, (x + cx * size, y + cy * size))
 
     def draw_scoreboard(self, x, y, w, h):
         rect = pygame.Rect(x, y, w, h)
@@ -741,40 +765,51 @@ class Game:
         pygame.draw.rect(sub, (255, 255, 255, 20), (0, 0, w, h), border_radius=8)
         pygame.draw.rect(sub, COLORS["frame"], (0, 0, w, h), width=2, border_radius=8)
 
-        title = self.font_small.render("SCOREBOARD", True, COLORS["subtext"])
+        title = self.text_surface(self.font_small, "SCOREBOARD", COLORS["subtext"])
         sub.blit(title, (int(self.block * 0.3), int(self.block * 0.3)))
 
-        hs = self.scores.get("high", 0)
-        hs_surf = self.font_small.render(f"High: {hs}", True, COLORS["text"])
+        hs = self.scores.high
+        hs_surf = self.text_surface(self.font_small, f"High: {hs}", COLORS["text"])
         sub.blit(hs_surf, (int(self.block * 0.3), int(self.block * 1.2)))
 
         line_h = int(self.block * 0.9)
         start_y = int(self.block * 2.0)
         max_rows = max(1, (h - start_y - int(self.block * 0.3)) // line_h)
-        hist = self.scores.get("history", [])[-max_rows:][::-1]
+        hist = list(self.scores.recent)[-max_rows:][::-1]
 
         yy = start_y
         for item in hist:
             sc = item.get("score", 0)
             lv = item.get("level", 0)
             line = f"L{lv}  {sc}"
-            txt = self.font_small.render(line, True, COLORS["text"])
+            txt = self.text_surface(self.font_small, line, COLORS["text"])
             sub.blit(txt, (int(self.block * 0.3), yy))
             yy += line_h
 
         self.screen.blit(sub, (x, y))
 
+    def banner_alpha(self):
+        t = self.board.tetris_banner_timer / 1200.0
+        return int(255 * clamp(t, 0.2, 1.0))
+
+    def banner_pos(self, w):
+        x = self.play_x + (self.play_w_px - w) // 2
+        return x, self.top_y + int(self.play_h_px * 0.12)
+
     def draw_banner(self):
         if self.board.tetris_banner_timer <= 0:
             return
-        t = self.board.tetris_banner_timer / 1200.0
-        alpha = int(255 * clamp(t, 0.2, 1.0))
-        surf = self.font_huge.render("TETRIS!", True, COLORS["accent"])
-        banner = surf.convert_alpha()
-        banner.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
-        x = self.play_x + (self.play_w_px - banner.get_width()) // 2
-        y = self.top_y + int(self.play_h_px * 0.12)
-        self.screen.blit(banner, (x, y))
+        banner = self.text_surface(self.font_huge, "TETRIS!", COLORS["accent"])
+        pos = self.banner_pos(banner.get_width())
+        self.blit_faded(banner, pos, self.banner_alpha())
+
+    def floater_alpha(self, f):
+        return clamp(int(255 * (f["life"] / 1000.0)), 0, 255)
+
+    def draw_floater(self, f):
+        s2 = self.text_surface(self.font_big, f["text"], f["color"])
+        pos = (int(f["x"] - s2.get_width() / 2), int(f["y"]))
+        self.blit_faded(s2, pos, self.floater_alpha(f))
 
     def draw_buttons(self):
         mouse_pos = pygame.mouse.get_pos()
@@ -787,7 +822,7 @@ class Game:
                 self.screen, COLORS["frame"], rect, width=2, border_radius=10
             )
 
-            txt = self.font_big.render(label, True, COLORS["button_text"])
+            txt = self.text_surface(self.font_big, label, COLORS["button_text"])
             self.screen.blit(
                 txt,
                 (
@@ -798,7 +833,7 @@ class Game:
 
     def draw_center_messages(self):
         if self.paused and not self.board.game_over:
-            txt = self.font_big.render("PAUSED", True, COLORS["subtext"])
+            txt = self.text_surface(self.font_big, "PAUSED", COLORS["subtext"])
             self.screen.blit(
                 txt,
                 (
@@ -810,8 +845,10 @@ class Game:
             overlay = pygame.Surface((self.play_w_px, self.play_h_px), pygame.SRCALPHA)
             overlay.fill((0, 0, 0, 140))
             self.screen.blit(overlay, (self.play_x, self.top_y))
-            t1 = self.font_huge.render("GAME OVER", True, COLORS["danger"])
-            t2 = self.font_big.render("Press R or click Restart", True, COLORS["text"])
+            t1 = self.text_surface(self.font_huge, "GAME OVER", COLORS["danger"])
+            t2 = self.text_surface(
+                self.font_big, "Press R or click Restart", COLORS["text"]
+            )
             cx = self.play_x + (self.play_w_px - t1.get_width()) // 2
             cy = self.top_y + int(self.play_h_px * 0.35)
             self.screen.blit(t1, (cx, cy))
@@ -823,51 +860,385 @@ class Game:
                 ),
             )
 
-    def render(self):
+    def draw_play(self):
+        self.draw_board()
+        if not self.board.game_over:
+            self.draw_ghost()
+            self.draw_piece(self.current)
+
+    # ---------------- Layered rendering ----------------
+    # Everything that only changes with the layout is drawn once into
+    # self.background. Each frame, a layer whose key changed, or an overlay
+    # that appeared, moved or vanished, marks its rect dirty; dirty rects are
+    # restored from the background, repainted in z-order with clipping, and
+    # pushed with display.update.
+    def build_background(self):
         self.screen.fill(COLORS["bg"])
         self.draw_title()
         self.draw_left_panel()
         self.draw_right_panel()
         self.draw_grid()
-        self.draw_board()
-        if not self.board.game_over:
-            self.draw_ghost()
-            self.draw_piece(self.current)
-        self.draw_banner()
+        self.background = self.screen.copy()
+        self.board_layer_key = None
+        self.layer_keys = {}
+        self.overlay_marks = []
+
+    def layers(self):
+        board = self.board
+        c = self.current
+        out = [
+            (name, rect, getattr(board, name), lambda n=name: self.draw_value(n))
+            for name, rect in self.value_rects.items()
+        ]
+        mouse_pos = pygame.mouse.get_pos()
+        hover = tuple(r.collidepoint(mouse_pos) for r in self.buttons.values())
+        buttons = self.buttons["restart"].union(self.buttons["exit"])
+        play = pygame.Rect(self.play_x, self.top_y, self.play_w_px, self.play_h_px)
+        play_key = (self.pieces, board.hash, c.kind, c.rot, c.x, c.y, board.game_over)
+        sb = self.scoreboard_rect
+        out += [
+            ("hold", self.hold_rect, self.hold, self.draw_hold),
+            ("next", self.next_rect, tuple(self.peek(VISIBLE_NEXT)), self.draw_next),
+            ("scoreboard", sb, self.scores_rev, lambda: self.draw_scoreboard(*sb)),
+            ("buttons", buttons, hover, self.draw_buttons),
+            ("play", play, play_key, self.draw_play),
+        ]
+        return out
+
+    def overlays(self):
+        out = []
+        if self.board.tetris_banner_timer > 0:
+            w, h = self.font_huge.size("TETRIS!")
+            rect = pygame.Rect(self.banner_pos(w), (w, h))
+            out.append((rect, self.banner_alpha(), self.draw_banner))
         for f in self.floaters:
-            s = self.font_big.render(f["text"], True, f["color"])
-            alpha = clamp(int(255 * (f["life"] / 1000.0)), 0, 255)
-            s2 = s.convert_alpha()
-            s2.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
-            self.screen.blit(s2, (int(f["x"] - s2.get_width() / 2), int(f["y"])))
-        self.draw_center_messages()
-        pygame.display.flip()
+            w, h = self.font_big.size(f["text"])
+            rect = pygame.Rect(int(f["x"] - w / 2), int(f["y"]), w, h)
+            key = (f["text"], self.floater_alpha(f))
+            out.append((rect, key, lambda f=f: self.draw_floater(f)))
+        if self.paused and not self.board.game_over:
+            w, h = self.font_big.size("PAUSED")
+            rect = pygame.Rect(
+                self.play_x + (self.play_w_px - w) // 2,
+                self.top_y + (self.play_h_px - h) // 2,
+                w,
+                h,
+            )
+            out.append((rect, "paused", self.draw_center_messages))
+        if self.board.game_over:
+            rect = pygame.Rect(self.play_x, self.top_y, self.play_w_px, self.play_h_px)
+            w1, h1 = self.font_huge.size("GAME OVER")
+            w2, h2 = self.font_big.size("Press R or click Restart")
+            cy = self.top_y + int(self.play_h_px * 0.35)
+            rect.union_ip((self.play_x + (self.play_w_px - w1) // 2, cy, w1, h1))
+            rect.union_ip(
+                (
+                    self.play_x + (self.play_w_px - w2) // 2,
+                    cy + h1 + int(self.block * 0.8),
+                    w2,
+                    h2,
+                )
+            )
+            out.append((rect, "game_over", self.draw_center_messages))
+        if self.show_profile:
+            rect = self.profile_surface.get_rect(topright=(self.SW - self.margin, 4))
+            out.append((rect, ("profile", self.profile_rev), self.draw_profile))
+        return out
+
+    def refresh_profile(self):
+        now = pygame.time.get_ticks()
+        if now - self.profile_refreshed < PROFILE_REFRESH_MS:
+            return
+        self.profile_refreshed = now
+        lines = [f"{'ms':<9}{'p50':>6}{'p95':>6}{'p99':>6}"]
+        lines += self.profiler.overlay_lines(PROFILE_PHASES)
+        line_h = self.font_small.get_linesize()
+        texts = [self.font_small.render(line, True, COLORS["text"]) for line in lines]
+        w = max(t.get_width() for t in texts) + 12
+        surf = pygame.Surface((w, line_h * len(texts) + 8), pygame.SRCALPHA)
+        surf.fill((0, 0, 0, 170))
+        for i, t in enumerate(texts):
+            surf.blit(t, (6, 4 + i * line_h))
+        self.profile_surface = surf
+        self.profile_rev += 1
+
+    def draw_profile(self):
+        rect = self.profile_surface.get_rect(topright=(self.SW - self.margin, 4))
+        self.screen.blit(self.profile_surface, rect)
+
+    def render(self):
+        prof = self.profiler
+        full = self.background is None
+        if full:
+            with prof.phase("background"):
+                self.build_background()
+        if self.show_profile:
+            self.refresh_profile()
+        dirty = []
+        layers = self.layers()
+        for name, rect, key, _ in layers:
+            if name not in self.layer_keys or self.layer_keys[name] != key:
+                self.layer_keys[name] = key
+                dirty.append(rect)
+        overlays = self.overlays()
+        marks = [(rect, key) for rect, key, _ in overlays]
+        if marks != self.overlay_marks:
+            dirty.extend(rect for rect, _ in self.overlay_marks)
+            dirty.extend(rect for rect, _ in marks)
+            self.overlay_marks = marks
+        if full:
+            dirty = [self.screen.get_rect()]
+        for area in dirty:
+            self.screen.set_clip(area)
+            self.screen.blit(self.background, area, area)
+            for name, rect, _, draw in layers:
+                if rect.colliderect(area):
+                    with prof.phase(name):
+                        draw()
+            with prof.phase("overlays"):
+                for rect, _, draw in overlays:
+                    if rect.colliderect(area):
+                        draw()
+        self.screen.set_clip(None)
+        if self.offscreen:
+            return
+        with prof.phase("present"):
+            if full:
+                pygame.display.flip()
+            elif dirty:
+                pygame.display.update(dirty)
 
     def end_run_record(self):
         now = datetime.now().strftime("%Y-%m-%d %H:%M")
         entry = {"time": now, "score": self.board.score, "level": self.board.level}
-        data = load_scores()
-        data["high"] = max(data.get("high", 0), self.board.score)
-        hist = data.get("history", [])
-        hist.append(entry)
-        if len(hist) > MAX_SAVED_SCORES:
-            hist = hist[-MAX_SAVED_SCORES:]
-        data["history"] = hist
-        save_scores(data)
-        self.scores = data
+        self.scores.add(entry)
+        self.scores_rev += 1
+        self.save_replay()
+
+    def save_replay(self):
+        if self.recording is None:
+            return
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.record_dir, f"{stamp}-{self.seed}{REPLAY_EXT}")
+        try:
+            Replay.from_engine(self).save(path)
+        except OSError:
+            pass
+        # A finished game is saved once, even if it is recorded again on restart
+        self.recording = None
 
     def quit_game(self):
+        if self.profile_path:
+            self.profiler.export(self.profile_path, self.profile_format)
+        self.scores.close()
         pygame.quit()
         sys.exit()
 
+    # Nothing moves on screen and nothing will until an event arrives
+    def idle(self):
+        return (
+            (self.paused or (self.board.game_over and self.bot is None))
+            and not self.floaters
+            and self.board.tetris_banner_timer <= 0
+        )
+
+    # Advances the simulation in fixed SIM_TICK_MS steps, so gravity runs the
+    # same at any frame rate; a backlog beyond MAX_CATCHUP_TICKS is dropped
+    def simulate(self, acc):
+        ticks = 0
+        while acc >= SIM_TICK_MS:
+            if ticks == MAX_CATCHUP_TICKS:
+                return 0.0
+            self.tick(SIM_TICK_MS)
+            acc -= SIM_TICK_MS
+            ticks += 1
+        return acc
+
     def run(self):
+        prof = self.profiler
+        acc = 0.0
+        last = time.perf_counter()
         while True:
-            dt = self.clock.tick(FPS)
-            self.handle_events()
-            self.tick_gravity(dt)
-            self.update_floaters(dt)
-            self.render()
+            events = None
+            waited = self.idle()
+            if waited:
+                # Block until there is input instead of spinning at the frame rate
+                first = pygame.event.wait(IDLE_WAIT_MS)
+                events = pygame.event.get()
+                if first.type != pygame.NOEVENT:
+                    events.insert(0, first)
+            elif not self.vsync:
+                self.clock.tick(self.fps)
+            now = time.perf_counter()
+            dt = (now - last) * 1000.0
+            last = now
+            prof.record("interval", dt)
+            if waited:
+                # Time spent blocked while idle is not game time: the frame
+                # that unpauses must not simulate it as catch-up gravity
+                dt = 0.0
+            prof.begin_frame()
+            with prof.phase("events"):
+                self.handle_events(events)
+            with prof.phase("bot"):
+                self.update_bot()
+            with prof.phase("simulate"):
+                acc = 0.0 if self.idle() else self.simulate(acc + dt)
+            with prof.phase("floaters"):
+                self.update_floaters(dt)
+            with prof.phase("render"):
+                self.render()
+            prof.end_frame()
+
+
+# Time to first frame, split into phases (ms). Run in a fresh process so no
+# imports or font lookups are warm.
+def startup_probe():
+    t_import = time.perf_counter()
+    import_pygame()
+    t_init = time.perf_counter()
+    game = Game()
+    t_frame = time.perf_counter()
+    game.render()
+    t_done = time.perf_counter()
+    game.scores.close()
+    pygame.quit()
+    return {
+        "modules_ms": (t_import - STARTED) * 1000,
+        "pygame_ms": (t_init - t_import) * 1000,
+        "init_ms": (t_frame - t_init) * 1000,
+        "first_frame_ms": (t_done - t_frame) * 1000,
+        "total_ms": (t_done - STARTED) * 1000,
+    }
+
+
+def bench_startup(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--startup-probe"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        sample["process_ms"] = (time.perf_counter() - start) * 1000
+        samples.append(sample)
+    return {
+        "runs": runs,
+        "video_driver": os.environ.get("SDL_VIDEODRIVER", "default"),
+        **{
+            key: {
+                "median": round(statistics.median(s[key] for s in samples), 2),
+                "min": round(min(s[key] for s in samples), 2),
+                "max": round(max(s[key] for s in samples), 2),
+            }
+            for key in samples[0]
+        },
+    }
 
 
 if __name__ == "__main__":
-    Game().run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--bot", action="store_true", help="let the heuristic bot play (autoplay)"
+    )
+    parser.add_argument("--bot-weights", help="JSON file of bot feature weights")
+    parser.add_argument(
+        "--bot-speed",
+        type=int,
+        default=0,
+        help="bot actions per frame (0 = place a whole piece every frame)",
+    )
+    parser.add_argument(
+        "--beam",
+        action="store_true",
+        help="autoplay with beam search over the next queue and hold",
+    )
+    parser.add_argument("--beam-width", type=int, default=8)
+    parser.add_argument("--beam-depth", type=int, default=3)
+    parser.add_argument(
+        "--plan-ms", type=float, default=12, help="planning budget per piece"
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        default=FPS,
+        help="render rate cap (0 = uncapped); the simulation steps at a fixed rate",
+    )
+    parser.add_argument(
+        "--vsync", action="store_true", help="pace rendering to the display refresh"
+    )
+    parser.add_argument(
+        "--scores",
+        default=SCORE_FILE,
+        help="score history: a JSON file, or SQLite for .db/.sqlite paths",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="save a replay of every game here (verify with replay.py)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write per-phase frame timings here on exit (F3 toggles the overlay)",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=EXPORT_FORMATS,
+        help="csv, json or chrome (trace-event); default from the file extension",
+    )
+    parser.add_argument(
+        "--board-width", type=int, default=GRID_W, help="columns (bots need 10)"
+    )
+    parser.add_argument(
+        "--board-height", type=int, default=GRID_H, help="rows (bots need 20)"
+    )
+    parser.add_argument(
+        "--bench-startup",
+        type=int,
+        metavar="RUNS",
+        help="measure time to first frame over RUNS fresh processes and exit",
+    )
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.startup_probe:
+        print(json.dumps(startup_probe()))
+        sys.exit()
+    if args.bench_startup:
+        print(json.dumps(bench_startup(args.bench_startup), indent=2))
+        sys.exit()
+    if min(args.board_width, args.board_height) < MIN_BOARD_SIZE:
+        parser.error(f"the board must be at least {MIN_BOARD_SIZE}x{MIN_BOARD_SIZE}")
+    bot = None
+    if args.bot or args.bot_weights or args.beam:
+        if (args.board_width, args.board_height) != (GRID_W, GRID_H):
+            parser.error(f"--bot and --beam play {GRID_W}x{GRID_H} boards only")
+        from bot import Bot, load_weights
+
+        weights = load_weights(args.bot_weights) if args.bot_weights else None
+        if args.beam:
+            from search import BeamPlanner
+
+            bot = BeamPlanner(
+                weights,
+                width=args.beam_width,
+                depth=args.beam_depth,
+                budget_ms=args.plan_ms,
+            )
+        else:
+            bot = Bot(weights)
+    Game(
+        bot=bot,
+        bot_speed=args.bot_speed,
+        profile_path=args.profile,
+        profile_format=args.profile_format,
+        record_dir=args.record,
+        scores_path=args.scores,
+        fps=args.fps,
+        vsync=args.vsync,
+        width=args.board_width,
+        height=args.board_height,
+    ).run()
@@ -0,0 +1,295 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bot import Bot, load_weights
+from engine import DEFAULT_RANDOMIZER, Engine
+
+# ----------------------- Settings -----------------------
+# Results are kept beside this file (and git-ignored), wherever it is run from
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(HERE, "tournament.jsonl")
+MAX_PIECES = 10000  # a game is stopped after this many pieces
+TIME_LIMIT_S = 300  # ... or after this much wall time
+Z_95 = 1.959964  # normal quantile for 95% intervals
+METRICS = ("score", "lines", "level", "pieces", "pieces_per_sec", "seconds")
+PROGRESS_S = 2.0
+AGENT_TYPES = ("bot", "beam")
+
+
+# ----------------------- Agents -----------------------
+# An agent config is {"name", "type": "bot" | "beam", "weights": {...} or a
+# JSON path, "use_hold"} plus width, depth and budget_ms for "beam". Weight
+# files are read up front so a game's config key covers the weights themselves.
+def resolve_agents(configs):
+    agents = []
+    names = set()
+    for config in configs:
+        config = dict(config)
+        name = config.get("name")
+        if not name or name in names:
+            raise ValueError(f"agent names must be unique and non-empty: {name!r}")
+        names.add(name)
+        config.setdefault("type", "bot")
+        if config["type"] not in AGENT_TYPES:
+            raise ValueError(f"{name}: unknown agent type {config['type']!r}")
+        if isinstance(config.get("weights"), str):
+            config["weights"] = load_weights(config["weights"])
+        agents.append(config)
+    return agents
+
+
+def config_key(config):
+    data = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def make_agent(config):
+    weights = config.get("weights")
+    if config["type"] == "beam":
+        from search import BeamPlanner
+
+        kwargs = {k: config[k] for k in ("width", "depth", "budget_ms") if k in config}
+        agent = BeamPlanner(weights, **kwargs)
+    else:
+        agent = Bot(weights)
+    agent.use_hold = config.get("use_hold", True)
+    return agent
+
+
+# ----------------------- Games -----------------------
+# Plays one game to top-out or a limit. Scoring is the engine's own
+# (Board.update_score_and_level on every lock), the same as in play.
+def play_game(agent, seed, max_pieces=MAX_PIECES, time_limit=TIME_LIMIT_S):
+    engine = Engine(seed)
+    start = time.perf_counter()
+    deadline = start + time_limit
+    end = "piece_limit"
+    while engine.pieces < max_pieces:
+        if engine.board.game_over:
+            break
+        if time.perf_counter() >= deadline:
+            end = "time_limit"
+            break
+        agent.play_piece(engine)
+    if engine.board.game_over:
+        end = "topped_out"
+    seconds = time.perf_counter() - start
+    b = engine.board
+    return {
+        "seed": seed,
+        "score": b.score,
+        "lines": b.lines,
+        "level": b.level,
+        "pieces": engine.pieces,
+        "seconds": round(seconds, 4),
+        "pieces_per_sec": round(engine.pieces / seconds, 1) if seconds else 0.0,
+        "end": end,
+    }
+
+
+_agents = {}
+
+
+# Pool task; agents are built once per process and reused across its games
+def _worker(args):
+    config, key, seed, max_pieces, time_limit = args
+    agent = _agents.get(key)
+    if agent is None:
+        agent = _agents[key] = make_agent(config)
+    result = play_game(agent, seed, max_pieces, time_limit)
+    return {"agent": config["name"], "config": key, **result}
+
+
+# ----------------------- Results -----------------------
+# One JSON line per finished game, appended and flushed as games finish. A
+# line cut short by an interruption is dropped (and truncated away) on load,
+# and games whose agent config or limits have changed since are played again.
+def load_results(path, keys):
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "rb") as f:
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    if end < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            r = json.loads(line)
+        except ValueError:
+            continue
+        if keys.get(r.get("agent")) == r.get("config"):
+            results[(r["agent"], r["seed"])] = r
+    return results
+
+
+def mean_ci(values):
+    n = len(values)
+    if n == 0:
+        return None
+    mean = math.fsum(values) / n
+    sd = statistics.stdev(values) if n > 1 else 0.0
+    half = Z_95 * sd / math.sqrt(n)
+    return {
+        "mean": round(mean, 3),
+        "sd": round(sd, 3),
+        "ci95": [round(mean - half, 3), round(mean + half, 3)],
+    }
+
+
+# Per agent: every metric's mean, sd and normal 95% interval over the seeds it
+# finished, and how its games ended. Every agent plays the same seeds, so each
+# is also compared with the first agent seed by seed (paired score difference).
+def summarize(agents, seeds, results):
+    out = {}
+    base = agents[0]["name"]
+    for config in agents:
+        name = config["name"]
+        games = [results[(name, s)] for s in seeds if (name, s) in results]
+        entry = {"games": len(games)}
+        for end in ("topped_out", "piece_limit", "time_limit"):
+            entry[end] = sum(1 for g in games if g["end"] == end)
+        for metric in METRICS:
+            entry[metric] = mean_ci([g[metric] for g in games])
+        if name != base:
+            pairs = [
+                (results[(name, s)]["score"], results[(base, s)]["score"])
+                for s in seeds
+                if (name, s) in results and (base, s) in results
+            ]
+            entry[f"score_vs_{base}"] = {
+                **(mean_ci([a - b for a, b in pairs]) or {}),
+                "wins": sum(1 for a, b in pairs if a > b),
+                "losses": sum(1 for a, b in pairs if a < b),
+                "ties": sum(1 for a, b in pairs if a == b),
+            }
+        out[name] = entry
+    return out
+
+
+# ----------------------- Runner -----------------------
+# Every (agent, seed) pairing not already in results_path is one pool task,
+# seeds outermost so an interrupted run has compared agents on the same seeds.
+# At most 2 x workers tasks are queued at a time.
+def run_tournament(
+    agents,
+    seeds,
+    results_path=RESULTS_FILE,
+    workers=None,
+    max_pieces=MAX_PIECES,
+    time_limit=TIME_LIMIT_S,
+    log=None,
+):
+    # The randomizer decides each seed's pieces, so results dealt by another
+    # one are played again
+    limits = {
+        "max_pieces": max_pieces,
+        "time_limit": time_limit,
+        "randomizer": DEFAULT_RANDOMIZER,
+    }
+    keys = {a["name"]: config_key({**a, **limits}) for a in agents}
+    results = load_results(results_path, keys)
+    todo = [
+        (config, keys[config["name"]], seed, max_pieces, time_limit)
+        for seed in seeds
+        for config in agents
+        if (config["name"], seed) not in results
+    ]
+    todo.reverse()
+    total = len(agents) * len(seeds)
+    workers = workers or os.cpu_count()
+    start = last_log = time.perf_counter()
+    played = 0
+    with open(results_path, "a", encoding="utf-8") as out:
+        with ProcessPoolExecutor(workers) as pool:
+            inflight = set()
+            while todo or inflight:
+                while todo and len(inflight) < 2 * workers:
+                    inflight.add(pool.submit(_worker, todo.pop()))
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    r = fut.result()
+                    results[(r["agent"], r["seed"])] = r
+                    out.write(json.dumps(r) + "\n")
+                    played += 1
+                out.flush()
+                now = time.perf_counter()
+                if log is not None and now - last_log >= PROGRESS_S:
+                    last_log = now
+                    print(
+                        f"{total - len(todo) - len(inflight)}/{total} games, "
+                        f"{played / (now - start):.2f} games/s",
+                        file=log,
+                    )
+    summary = summarize(agents, seeds, results)
+    return {
+        "seeds": [seeds.start, seeds.stop],
+        "games_played": played,
+        "seconds": round(time.perf_counter() - start, 3),
+        "agents": summary,
+    }
+
+
+def parse_seeds(text):
+    try:
+        first, _, last = text.partition(":")
+        seeds = range(int(first), int(last)) if last else range(int(first))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START:STOP or COUNT, got {text!r}")
+    if not seeds:
+        raise argparse.ArgumentTypeError(f"empty seed range {text!r}")
+    return seeds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Play every agent on every seed and summarize the results"
+    )
+    parser.add_argument(
+        "agents", help="JSON list of agent configs (name, type, weights, ...)"
+    )
+    parser.add_argument(
+        "--seeds",
+        type=parse_seeds,
+        default=range(100),
+        help="START:STOP (half-open) or a count from 0 (default 100)",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--max-pieces", type=int, default=MAX_PIECES)
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=TIME_LIMIT_S,
+        help="seconds per game before it is stopped",
+    )
+    parser.add_argument(
+        "--results",
+        default=RESULTS_FILE,
+        help="per-game results; finished games here are not played again",
+    )
+    args = parser.parse_args()
+    try:
+        with open(args.agents, "r", encoding="utf-8") as f:
+            agents = resolve_agents(json.load(f))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not agents:
+        parser.error("no agents given")
+    result = run_tournament(
+        agents,
+        args.seeds,
+        args.results,
+        args.workers,
+        args.max_pieces,
+        args.time_limit,
+        log=sys.stderr,
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+# ----------------------- Settings -----------------------
+TT_SIZE = 1 << 16
+
+
+# Bounded cache for search results. "lru" keeps the most recently used entries;
+# "depth" is a fixed-slot table indexed by the (Zobrist) key where an entry is
+# only replaced by one searched at least as deep.
+class TranspositionTable:
+    def __init__(self, capacity=TT_SIZE, policy="lru"):
+        if policy not in ("lru", "depth"):
+            raise ValueError(f"unknown replacement policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.clear()
+
+    def clear(self):
+        if self.policy == "lru":
+            self.entries = OrderedDict()
+        else:
+            self.entries = [None] * self.capacity
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, depth=0):
+        if self.policy == "lru":
+            found = self.entries.get(key)
+            if found is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return found[1]
+        else:
+            slot = self.entries[hash(key) % self.capacity]
+            if slot is not None and slot[0] == key and slot[1] >= depth:
+                self.hits += 1
+                return slot[2]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth=0):
+        if self.policy == "lru":
+            self.entries[key] = (depth, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            return
+        i = hash(key) % self.capacity
+        slot = self.entries[i]
+        if slot is not None:
+            if slot[0] != key and slot[1] > depth:
+                return
+            if slot[0] != key:
+                self.evictions += 1
+        self.entries[i] = (key, depth, value)
+
+    def __len__(self):
+        if self.policy == "lru":
+            return len(self.entries)
+        return sum(slot is not None for slot in self.entries)
+
+    def stats(self):
+        looked = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / looked, 3) if looked else 0.0,
+        }